@@ -0,0 +1,275 @@
+"""
+Activity tracking for the object grid. A TrackedGrid behaves exactly like
+the list-of-lists grid the particles expect, but every write to a cell is
+reported to its observers, which lets the update loop skip settled regions.
+"""
+from operator import attrgetter
+import numpy as np
+from materials import DYNAMIC
+from baseParticle import STEP_DT
+
+CHUNK_SIZE = 8
+WAKE_MARGIN = 1  # cells around a change that may react to it next frame
+SLEEP_DELAY = 4  # quiet frames before a chunk goes back to sleep, covers random movement rolls
+
+
+class TrackedRow(list):
+    __slots__ = ("y", "base", "world")
+
+    def __setitem__(self, x, value):
+        old = list.__getitem__(self, x)
+        list.__setitem__(self, x, value)
+        world = self.world
+        if world.changed is not None:
+            world.changed.append(self.base + x)
+        for observer in world.observers:
+            observer.cellChanged(x, self.y, old, value)
+
+
+class TrackedGrid(list):
+    """grid[y][x] access like a plain list of rows, writes are reported to observers."""
+
+    def __init__(self, width, height):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.observers = []
+        self.changed = None  # y * width + x of every write while a ChunkTracker watches, see ChunkTracker.watch
+        self.frame = 0  # simulation step counter, stamped onto particles as they update
+        self.boundsChecks = True  # cleared by padding.newPaddedGrid, see Particle.checksBounds
+        self.stepDt = STEP_DT  # see Particle.stepLength
+        for y in range(height):
+            row = TrackedRow([None] * width)
+            row.y = y
+            row.base = y * width
+            row.world = self
+            self.append(row)
+
+
+def newGrid(width, height):
+    return TrackedGrid(width, height)
+
+
+class ChunkTracker:
+    """
+    Splits the world into CHUNK_SIZE squares. Each chunk keeps a dirty rectangle
+    of cells that changed (plus WAKE_MARGIN) and only awake chunks are updated.
+    """
+
+    def __init__(self, width, height, chunkSize=CHUNK_SIZE):
+        self.width = width
+        self.height = height
+        self.chunkSize = chunkSize
+        self.chunksX = (width + chunkSize - 1) // chunkSize
+        self.chunksY = (height + chunkSize - 1) // chunkSize
+        count = self.chunksX * self.chunksY
+        self.rects = [None] * count  # dirty rect [minX, minY, maxX, maxY] updated this frame
+        self.nextRects = [None] * count  # collected while the frame runs, used next frame
+        self.sleepTimers = [0] * count
+        self.focus = None  # (minCX, minCY, maxCX, maxCY) chunks that update, None for all, see setFocus
+        self.grid = None
+        self.wakeAll()
+
+    def watch(self, grid):
+        """
+        Wake chunks from the writes to a TrackedGrid. The grid only logs where it was
+        written, which costs far less per write than a cellChanged call, and the log
+        is turned into dirty rectangles in one pass at the next beginFrame.
+        """
+        self.grid = grid
+        grid.changed = []
+
+    def takeChanges(self):
+        changed = self.grid.changed
+        if not changed:
+            return
+        size, margin = self.chunkSize, WAKE_MARGIN
+        cells = np.array(changed, dtype=np.intp)
+        changed.clear()
+        # Mask of the written cells grown by WAKE_MARGIN, over whole chunks so it splits into blocks
+        mask = np.zeros((self.chunksY * size, self.chunksX * size), dtype=bool)
+        mask[cells // self.grid.width, cells % self.grid.width] = True
+        for _ in range(margin):
+            grown = mask.copy()
+            grown[:-1] |= mask[1:]
+            grown[1:] |= mask[:-1]
+            mask = grown.copy()
+            mask[:, :-1] |= grown[:, 1:]
+            mask[:, 1:] |= grown[:, :-1]
+        mask[self.height:] = False
+        mask[:, self.width:] = False
+        blocks = mask.reshape(self.chunksY, size, self.chunksX, size)
+        columns = blocks.any(axis=1)  # [cy, cx, x in chunk]
+        rows = blocks.any(axis=3).transpose(0, 2, 1)  # [cy, cx, y in chunk]
+        awake = columns.any(axis=2)
+        left, right = columns.argmax(axis=2), size - 1 - columns[:, :, ::-1].argmax(axis=2)
+        top, bottom = rows.argmax(axis=2), size - 1 - rows[:, :, ::-1].argmax(axis=2)
+        for cy, cx in zip(*np.nonzero(awake)):
+            x, y = cx * size, cy * size
+            self.grow(int(cy * self.chunksX + cx), int(x + left[cy, cx]), int(y + top[cy, cx]),
+                      int(x + right[cy, cx]), int(y + bottom[cy, cx]))
+
+    def setFocus(self, minX, minY, maxX, maxY):
+        """
+        Only update chunks touching the inclusive cell rectangle from the next beginFrame on.
+        Chunks outside are held: they keep what woke them and resume once back in focus.
+        """
+        size = self.chunkSize
+        self.focus = (max(minX, 0) // size, max(minY, 0) // size,
+                      min(maxX, self.width - 1) // size, min(maxY, self.height - 1) // size)
+
+    def clearFocus(self):
+        self.focus = None
+
+    def wakeAll(self):
+        self.wakeRect(0, 0, self.width - 1, self.height - 1)
+
+    def cellChanged(self, x, y, old, new):
+        margin = WAKE_MARGIN
+        self.wakeRect(x - margin, y - margin, x + margin, y + margin)
+
+    def keepAwake(self, x, y):
+        """Request another update of a cell whose particle has internal state, like a timer."""
+        self.wakeRect(x, y, x, y)
+
+    def wakeRect(self, minX, minY, maxX, maxY):
+        minX, minY = max(minX, 0), max(minY, 0)
+        maxX, maxY = min(maxX, self.width - 1), min(maxY, self.height - 1)
+        if minX > maxX or minY > maxY:
+            return
+        size = self.chunkSize
+        for cy in range(minY // size, maxY // size + 1):
+            top, bottom = cy * size, cy * size + size - 1
+            for cx in range(minX // size, maxX // size + 1):
+                left, right = cx * size, cx * size + size - 1
+                self.grow(cy * self.chunksX + cx, max(minX, left), max(minY, top), min(maxX, right), min(maxY, bottom))
+
+    def grow(self, index, x0, y0, x1, y1):
+        """Add a rectangle inside chunk index to the area it updates next frame."""
+        rect = self.nextRects[index]
+        if rect is None:
+            self.nextRects[index] = [x0, y0, x1, y1]
+        else:
+            if x0 < rect[0]: rect[0] = x0
+            if y0 < rect[1]: rect[1] = y0
+            if x1 > rect[2]: rect[2] = x1
+            if y1 > rect[3]: rect[3] = y1
+
+    def beginFrame(self):
+        """Promote the rectangles collected last frame to the ones updated this frame."""
+        if self.grid is not None:
+            self.takeChanges()
+        focus = self.focus
+        for index, rect in enumerate(self.nextRects):
+            if focus is not None and not (focus[0] <= index % self.chunksX <= focus[2]
+                                          and focus[1] <= index // self.chunksX <= focus[3]):
+                # Held out of focus: fold the awake area back in so it is promoted when the chunk returns
+                held = self.rects[index]
+                if held is not None:
+                    if rect is None:
+                        self.nextRects[index] = held
+                    else:
+                        self.nextRects[index] = [min(rect[0], held[0]), min(rect[1], held[1]),
+                                                 max(rect[2], held[2]), max(rect[3], held[3])]
+                    self.rects[index] = None
+                continue
+            if rect is not None:
+                old = self.rects[index]
+                if old is not None and self.sleepTimers[index] > 0:
+                    rect = [min(rect[0], old[0]), min(rect[1], old[1]), max(rect[2], old[2]), max(rect[3], old[3])]
+                self.rects[index] = rect
+                self.sleepTimers[index] = SLEEP_DELAY
+                self.nextRects[index] = None
+            elif self.sleepTimers[index] > 0:
+                self.sleepTimers[index] -= 1
+            else:
+                self.rects[index] = None
+
+    def isAwake(self, cx, cy):
+        return self.rects[cy * self.chunksX + cx] is not None
+
+    def awakeCount(self):
+        return sum(rect is not None for rect in self.rects)
+
+    def awakeRows(self):
+        """Yield (y, spans) bottom to top, spans being sorted inclusive x ranges that need updating."""
+        size = self.chunkSize
+        for cy in range(self.chunksY - 1, -1, -1):
+            rects = [rect for rect in self.rects[cy * self.chunksX:(cy + 1) * self.chunksX] if rect is not None]
+            if not rects:
+                continue
+            for y in range(min(cy * size + size, self.height) - 1, cy * size - 1, -1):
+                spans = []
+                for rect in rects:
+                    if rect[1] <= y <= rect[3]:
+                        if spans and spans[-1][1] + 1 == rect[0]:
+                            spans[-1] = (spans[-1][0], rect[2])
+                        else:
+                            spans.append((rect[0], rect[2]))
+                if spans:
+                    yield y, spans
+
+
+class ActiveSet:
+    """
+    Every live particle that has behaviour (anything but Rock and Wood), kept in one set per
+    CHUNK_SIZE square so a ChunkTracker's sleeping chunks cost nothing. Particles are added
+    when they are written into the grid, by move, swap, delete_and_replace, explode or a
+    direct assignment, and dropped lazily once they are no longer where they claim to be.
+    """
+
+    def __init__(self, grid, chunkSize=CHUNK_SIZE):
+        self.grid = grid
+        self.chunkSize = chunkSize
+        self.chunksX = (len(grid[0]) + chunkSize - 1) // chunkSize  # indices match a ChunkTracker's
+        self.chunks = {}  # chunk index -> set of particles written into it
+        for y, row in enumerate(grid):
+            for x, particle in enumerate(row):
+                self.cellChanged(x, y, None, particle)
+
+    def __len__(self):
+        return sum(len(particles) for particles in self.chunks.values())
+
+    def __iter__(self):
+        for particles in self.chunks.values():
+            yield from particles
+
+    def cellChanged(self, x, y, old, new):
+        if new is not None and DYNAMIC[new.materialId]:
+            index = (y // self.chunkSize) * self.chunksX + x // self.chunkSize
+            particles = self.chunks.get(index)
+            if particles is None:
+                self.chunks[index] = {new}
+            else:
+                particles.add(new)
+
+    def isLive(self, particle):
+        return self.grid[particle.y][particle.x] is particle
+
+    def rows(self, tracker=None):
+        """
+        Snapshot of the live particles bucketed by row, yielded bottom to top with each row
+        ordered left to right on even rows and right to left on odd rows, like single_core_update.
+        With a tracker only the particles of its awake chunks are included.
+        """
+        grid = self.grid
+        buckets = {}
+        for index in list(self.chunks):
+            if tracker is not None and tracker.rects[index] is None:
+                continue  # asleep, its particles wait in their set until the chunk wakes
+            particles = self.chunks[index]
+            stale = []
+            for particle in particles:
+                x, y = particle.x, particle.y
+                if grid[y][x] is particle and (y // self.chunkSize) * self.chunksX + x // self.chunkSize == index:
+                    buckets.setdefault(y, []).append(particle)
+                else:
+                    stale.append(particle)  # gone, or moved and added to its new chunk's set
+            particles.difference_update(stale)
+            if not particles:
+                del self.chunks[index]
+        byX = attrgetter("x")
+        for y in sorted(buckets, reverse=True):
+            row = buckets[y]
+            row.sort(key=byX, reverse=y % 2 == 1)
+            yield y, row
@@ -0,0 +1,218 @@
+import numpy as np
+from materials import MATERIALS, EMPTY, TRAVELLING, WALL, CLASSES, loadAll
+
+# Bits stored in ArrayGrid.flags
+FLAG_FLAMMABLE = 1
+FLAG_EXPLOSIVE = 2
+FLAG_GAS = 4
+FLAG_FALLING = 8
+
+# name, extra dimensions after [y, x], dtype of every per-cell array, in fields() order
+FIELDS = (
+    ("material", (), np.uint8),
+    ("variant", (), np.uint8),  # shader variant of the cell
+    ("color", (3,), np.uint8),
+    ("lifetime", (), np.uint16),
+    ("delay", (), np.uint8),  # frames since the cell last moved
+    ("velocity", (2,), np.float32),
+    ("flags", (), np.uint8),
+)
+
+
+class ArrayGrid:
+    """
+    Struct-of-arrays world. Every property of a cell lives in its own
+    NumPy array indexed [y, x] so the whole world can be scanned, copied
+    or shared as a handful of flat buffers.
+    """
+
+    def __init__(self, width, height, padding=0):
+        # width and height are the array dimensions, including a wall border of padding cells
+        self.padding = padding
+        width, height = width + 2 * padding, height + 2 * padding
+        self.width = width
+        self.height = height
+        for name, extra, dtype in FIELDS:
+            setattr(self, name, self.allocate((height, width) + extra, dtype))
+        if padding:
+            self.material[:padding, :] = self.material[-padding:, :] = WALL
+            self.material[:, :padding] = self.material[:, -padding:] = WALL
+
+    def allocate(self, shape, dtype):
+        """Zeroed storage for one field, subclasses may place it elsewhere (see sharedWorld.py)."""
+        return np.zeros(shape, dtype=dtype)
+
+    def fields(self):
+        """Every per-cell array, in a fixed order."""
+        return (self.material, self.variant, self.color, self.lifetime,
+                self.delay, self.velocity, self.flags)
+
+    def nbytes(self):
+        return sum(field.nbytes for field in self.fields())
+
+    def copy(self):
+        other = ArrayGrid.__new__(ArrayGrid)
+        other.width, other.height, other.padding = self.width, self.height, self.padding
+        other.material, other.variant, other.color, other.lifetime, \
+            other.delay, other.velocity, other.flags = (field.copy() for field in self.fields())
+        return other
+
+    def columns(self, x0, x1):
+        """ArrayGrid over columns x0 to x1 - 1 whose fields are views, writes go to this grid."""
+        return self.region(x0, 0, x1, self.height)
+
+    def region(self, x0, y0, x1, y1):
+        """ArrayGrid over the cells [y0:y1, x0:x1] whose fields are views, writes go to this grid."""
+        other = ArrayGrid.__new__(ArrayGrid)
+        other.width, other.height, other.padding = x1 - x0, y1 - y0, 0
+        for name, _, _ in FIELDS:
+            setattr(other, name, getattr(self, name)[y0:y1, x0:x1])
+        return other
+
+    def clear(self, x, y):
+        for field in self.fields():
+            field[y, x] = 0
+
+    def setCell(self, x, y, materialId, color, lifetime=0, variant=0, flags=0):
+        self.clear(x, y)
+        self.material[y, x] = materialId
+        self.color[y, x] = color
+        self.lifetime[y, x] = lifetime
+        self.variant[y, x] = variant
+        self.flags[y, x] = flags
+
+    def setParticle(self, x, y, particle):
+        """Store a Particle object's state in the cell, None empties it."""
+        if particle is None:
+            self.clear(x, y)
+            return
+        flags = 0
+        if particle.getFlammable():
+            flags |= FLAG_FLAMMABLE
+        if particle.isExplosive:
+            flags |= FLAG_EXPLOSIVE
+        if particle.isGas:
+            flags |= FLAG_GAS
+        if getattr(particle, "falling", False):
+            flags |= FLAG_FALLING
+        lifetime = min(max(getattr(particle, "lifeTime", 0), 0), 0xFFFF)
+        self.setCell(x, y, particle.materialId, particle.color, lifetime, particle.shaderVariant, flags)
+        self.delay[y, x] = getattr(particle, "timeSinceMovement", 0)
+        self.velocity[y, x] = particle.velocity
+
+    def isEmpty(self, x, y):
+        return self.material[y, x] == EMPTY
+
+    @classmethod
+    def fromParticles(cls, grid, padding=0):
+        """Build an ArrayGrid from the list-of-lists grid used by main.py, padding is the grid's wall border."""
+        world = cls(len(grid[0]) - 2 * padding, len(grid) - 2 * padding, padding)
+        for y, row in enumerate(grid):
+            for x, particle in enumerate(row):
+                if particle is not None:
+                    world.setParticle(x, y, particle)
+        return world
+
+    def toParticles(self):
+        """Rebuild a list-of-lists grid of Particle objects from the arrays."""
+        loadAll()
+        grid = [[None for _ in range(self.width)] for _ in range(self.height)]
+        ys, xs = np.nonzero(self.material)
+        for y, x in zip(ys.tolist(), xs.tolist()):
+            materialId = self.material[y, x]
+            if CLASSES[materialId] is None or materialId == TRAVELLING:
+                continue  # Travelling particles cannot be rebuilt without their payload
+            particle = CLASSES[materialId](x, y)
+            if particle.shader is not None:
+                particle.useShaderVariant(int(self.variant[y, x]))
+            else:
+                particle.color = tuple(self.color[y, x].tolist())
+            if hasattr(particle, "lifeTime") and self.lifetime[y, x]:
+                particle.lifeTime = int(self.lifetime[y, x])
+            grid[y][x] = particle
+        return grid
+
+    # Compatibility view so code written against grid[y][x] keeps working
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if not 0 <= y < self.height:
+            raise IndexError(y)
+        return GridRow(self, y)
+
+
+class GridRow:
+    """One row of an ArrayGrid, indexed like a row of the object grid."""
+
+    __slots__ = ("world", "y")
+
+    def __init__(self, world, y):
+        self.world = world
+        self.y = y
+
+    def __len__(self):
+        return self.world.width
+
+    def __getitem__(self, x):
+        if not 0 <= x < self.world.width:
+            raise IndexError(x)
+        if self.world.material[self.y, x] == EMPTY:
+            return None
+        return CellView(self.world, x, self.y)
+
+    def __setitem__(self, x, particle):
+        self.world.setParticle(x, self.y, particle)
+
+
+class CellView:
+    """Read-only stand in for a Particle, backed by the arrays of an ArrayGrid."""
+
+    __slots__ = ("world", "x", "y")
+
+    def __init__(self, world, x, y):
+        self.world = world
+        self.x = x
+        self.y = y
+
+    @property
+    def materialId(self):
+        return int(self.world.material[self.y, self.x])
+
+    @property
+    def type(self):
+        return MATERIALS[self.materialId]
+
+    @property
+    def color(self):
+        return tuple(self.world.color[self.y, self.x].tolist())
+
+    @property
+    def lifeTime(self):
+        return int(self.world.lifetime[self.y, self.x])
+
+    @property
+    def velocity(self):
+        return self.world.velocity[self.y, self.x].tolist()
+
+    @property
+    def flammable(self):
+        return bool(self.world.flags[self.y, self.x] & FLAG_FLAMMABLE)
+
+    @property
+    def isExplosive(self):
+        return bool(self.world.flags[self.y, self.x] & FLAG_EXPLOSIVE)
+
+    @property
+    def isGas(self):
+        return bool(self.world.flags[self.y, self.x] & FLAG_GAS)
+
+    def getType(self):
+        return self.type
+
+    def getFlammable(self):
+        return self.flammable
+
+    def getLoc(self):
+        return (self.x, self.y)
+
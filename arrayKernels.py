@@ -0,0 +1,258 @@
+"""
+Whole-grid NumPy update passes for an ArrayGrid. Each pass handles one family
+of materials with a handful of array operations instead of calling update()
+on every particle.
+"""
+import numpy as np
+from particleShaders import SHADERS
+from materials import EMPTY, IS_SAND, IS_FLUID, IS_GAS, DISPLACES, SPREAD, FIRE, STEAM, WATER, CLASSES, table
+
+MOVEMENT_DELAY = 2  # Gas.movementDelay, frames a gas waits between moves
+# Materials whose update() the kernels reproduce, as long as nothing they react with is around.
+# Every other material only moves like its family (Acid flows but never dissolves) or sits still.
+KERNEL_MATERIALS = table("Sand", "Gravel", "Gunpowder", "Mulch", "Water", "Oil", "Steam", "Smoke", "Rock", "Wood", "Wall")
+
+SAND_LOOKUP = np.array(IS_SAND, dtype=bool)
+FLUID_LOOKUP = np.array(IS_FLUID, dtype=bool)
+GAS_LOOKUP = np.array(IS_GAS, dtype=bool)
+DISPLACES_LOOKUP = np.array(DISPLACES, dtype=bool)
+SPREAD_LOOKUP = np.array(SPREAD, dtype=np.uint8)
+
+
+def moveCells(world, srcY, srcX, dstY, dstX, extra=()):
+    """Move every field of the source cells to the destination cells, emptying the sources."""
+    for field in world.fields() + tuple(extra):
+        values = field[srcY, srcX]
+        field[srcY, srcX] = 0
+        field[dstY, dstX] = values
+
+
+def swapCells(world, y0, x0, y1, x1):
+    for field in world.fields():
+        values = field[y0, x0]
+        field[y0, x0] = field[y1, x1]
+        field[y1, x1] = values
+
+
+def sinkDenser(world, moved):
+    """
+    Swap vertical pairs where the upper cell is denser and both can move, so sands
+    sink through fluids, Water sinks under Oil and fluids sink through Smoke/Steam.
+    Even and odd rows are done in separate sub-steps so no cell is in two swaps.
+    """
+    material = world.material
+    for parity in (0, 1):
+        sinking = DISPLACES_LOOKUP[material[:-1], material[1:]] & ~moved[:-1] & ~moved[1:]
+        sinking[1 - parity::2] = False
+        srcY, srcX = np.nonzero(sinking)
+        if len(srcY):
+            swapCells(world, srcY, srcX, srcY + 1, srcX)
+            moved[srcY, srcX] = True
+            moved[srcY + 1, srcX] = True
+
+
+def fallStraight(world, movers, moved):
+    """
+    Shift down by one every mover that sits on top of an empty cell, including
+    whole stacks of movers resting on it, like the bottom-to-top scan would.
+    Cells that received a mover are set in moved.
+    """
+    material = world.material
+    height = world.height
+    movers = movers & ~moved
+    rows = np.arange(height)[:, None]
+    # Row of the first non-mover at or below each cell, height when there is none
+    blockers = np.where(movers, height, rows)
+    firstBlocker = np.minimum.accumulate(blockers[::-1], axis=0)[::-1]
+    hasBlocker = firstBlocker < height
+    landing = material[np.minimum(firstBlocker, height - 1), np.arange(world.width)[None, :]] == EMPTY
+    falling = movers & hasBlocker & landing
+    srcY, srcX = np.nonzero(falling)
+    moveCells(world, srcY, srcX, srcY + 1, srcX)
+    moved[srcY, srcX] = False
+    moved[srcY + 1, srcX] = True
+
+
+def slideDiagonal(world, lookup, moved, rng):
+    """
+    Let movers (material ids set in lookup) that could not fall straight slide to a random
+    diagonal. Sub-steps move one direction at a time so no two movers can claim the same
+    target cell, and each mover tries its preferred side first like BaseSand.update.
+    """
+    material = world.material
+    preferLeft = rng.random(material.shape) < 0.5
+    for prefer, dx in ((True, -1), (False, 1), (True, 1), (False, -1)):
+        empty = material == EMPTY
+        supported = np.ones_like(empty)
+        supported[:-1] = ~empty[1:]
+        targetEmpty = _shiftedEmpty(empty, 1, dx)
+        sliding = lookup[material] & supported & targetEmpty & ~moved & (preferLeft == prefer)
+        srcY, srcX = np.nonzero(sliding)
+        if len(srcY):
+            moveCells(world, srcY, srcX, srcY + 1, srcX + dx)
+            moved[srcY + 1, srcX + dx] = True
+
+
+def disperse(world, lookup, moved, rng):
+    """
+    Spread resting fluids sideways by up to their SPREAD cells. Every fluid picks a side,
+    then each sub-step moves all fluids heading one way by a single cell into empty space,
+    so trains of fluid flow out one cell behind the other instead of colliding.
+    """
+    material = world.material
+    resting = lookup[material] & ~moved
+    direction = np.where(rng.random(material.shape) < 0.5, -1, 1).astype(np.int8)
+    direction[~resting] = 0
+    remaining = np.where(resting, SPREAD_LOOKUP[material], 0).astype(np.uint8)
+    for _ in range(int(SPREAD_LOOKUP.max())):
+        for dx in (-1, 1):
+            targetEmpty = _shiftedEmpty(material == EMPTY, 0, dx)
+            flowing = (direction == dx) & (remaining > 0) & targetEmpty
+            srcY, srcX = np.nonzero(flowing)
+            if len(srcY):
+                remaining[srcY, srcX] -= 1
+                moveCells(world, srcY, srcX, srcY, srcX + dx, (direction, remaining, moved))
+                moved[srcY, srcX + dx] = True
+        if not remaining.any():
+            break
+
+
+def ageGases(world, rng, frozen=None, handled=None):
+    """
+    Count down every gas lifetime, removing expired gases. Steam on its last tick
+    condenses back into Water half the time, like Steam.update.
+    Returns the mask of gases still alive. Gases in frozen belong to a neighbouring
+    region and gases in handled were already updated this step, both are left alone.
+    """
+    material, lifetime = world.material, world.lifetime
+    gas = GAS_LOOKUP[material]
+    for skipped in (frozen, handled):
+        if skipped is not None:
+            gas &= ~skipped
+    condensing = gas & (material == STEAM) & (lifetime == 1) & (rng.random(material.shape) < 0.5)
+    if condensing.any():
+        ys, xs = np.nonzero(condensing)
+        for field in world.fields():
+            field[ys, xs] = 0
+        shaders = compiledShaders(WATER)
+        variants = rng.integers(len(shaders), size=len(ys))
+        material[ys, xs] = WATER
+        world.variant[ys, xs] = variants
+        world.color[ys, xs] = np.array([shader.fetchColor() for shader in shaders], dtype=np.uint8)[variants]
+        gas &= ~condensing
+    expired = gas & (lifetime <= 1)
+    if expired.any():
+        ys, xs = np.nonzero(expired)
+        for field in world.fields():
+            field[ys, xs] = 0
+        gas &= ~expired
+    lifetime[gas] -= 1
+    return gas
+
+
+def driftGases(world, gas, moved, rng):
+    """
+    Move every gas whose movement delay has run out: swap up through Fire, rise into
+    empty space, otherwise drift sideways (left first on a coin flip, then right), like
+    Gas.update. Gases that are waiting, or could not move, count their delay up instead.
+    """
+    material, delay = world.material, world.delay
+    waiting = gas & ~moved
+    pending = waiting & (delay >= MOVEMENT_DELAY)
+    waiting &= ~pending
+    delay[waiting] = np.minimum(delay[waiting], MOVEMENT_DELAY) + 1
+    delay[pending] = 0
+
+    underFire = np.zeros_like(pending)
+    underFire[1:] = material[:-1] == FIRE
+    ys, xs = np.nonzero(pending & underFire)
+    if len(ys):
+        swapCells(world, ys, xs, ys - 1, xs)
+        moved[ys, xs] = moved[ys - 1, xs] = True
+        pending[ys, xs] = False
+
+    tryLeft = rng.random(material.shape) < 0.5
+    for dy, dx, extraCheck in ((-1, 0, None), (0, -1, tryLeft), (0, 1, None)):
+        targetEmpty = _shiftedEmpty(material == EMPTY, dy, dx)
+        movers = pending & targetEmpty
+        if extraCheck is not None:
+            movers &= extraCheck
+        ys, xs = np.nonzero(movers)
+        if len(ys):
+            pending[ys, xs] = False
+            moveCells(world, ys, xs, ys + dy, xs + dx)
+            moved[ys + dy, xs + dx] = True
+    delay[pending] = 1  # nowhere to go, Gas.update still counts the frame
+
+
+def compiledShaders(materialId):
+    """Shader variants of a material, the palettes ArrayGrid cells index with their variant."""
+    if materialId not in SHADERS:
+        CLASSES[materialId](0, 0)  # compiled by the first particle of the material, once per process
+    return SHADERS[materialId]
+
+
+def _shiftedEmpty(empty, dy, dx):
+    """Mask of cells whose neighbour at (dx, dy) is inside the grid and empty."""
+    height, width = empty.shape
+    result = np.zeros_like(empty)
+    result[max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)] = \
+        empty[max(0, dy):height - max(0, -dy), max(0, dx):width - max(0, -dx)]
+    return result
+
+
+def stepSand(world, rng, moved):
+    """One BaseSand.update for every Sand, Gravel, Gunpowder and Mulch grain at once."""
+    fallStraight(world, SAND_LOOKUP[world.material], moved)
+    slideDiagonal(world, SAND_LOOKUP, moved, rng)
+
+
+def stepFluids(world, rng, moved):
+    """Falling, diagonal flow and sideways spread of every fluid at once."""
+    fallStraight(world, FLUID_LOOKUP[world.material], moved)
+    slideDiagonal(world, FLUID_LOOKUP, moved, rng)
+    disperse(world, FLUID_LOOKUP, moved, rng)
+
+
+def stepGases(world, rng, moved, frozen=None, handled=None):
+    """Lifetimes, condensation, rising and drifting of every gas at once."""
+    gas = ageGases(world, rng, frozen, handled)
+    driftGases(world, gas, moved, rng)
+
+
+def stepWorld(world, rng, moved=None, frozen=None):
+    """
+    One step of every kernel. moved holds the cells that already moved this step, frozen
+    the cells that may receive movers but must not act themselves, like the halo of a band.
+    """
+    if moved is None:
+        moved = np.zeros(world.material.shape, dtype=bool)
+        handled = None
+    else:
+        handled = moved.copy()  # handled by a region stepped earlier, like a gas that drifted in
+    if frozen is not None:
+        moved |= frozen
+    sinkDenser(world, moved)
+    stepSand(world, rng, moved)
+    stepFluids(world, rng, moved)
+    stepGases(world, rng, moved, frozen, handled)
+
+
+def stepRegion(world, moved, x0, y0, x1, y1, rng, halo=1):
+    """
+    Step the cells [y0:y1, x0:x1] of a world in place, together with a frozen halo around
+    them that movers may enter. moved is the world-sized mask of cells that already moved
+    this step, it gains every cell that moved here, so regions stepped later leave them alone.
+    """
+    lo, top = max(x0 - halo, 0), max(y0 - halo, 0)
+    hi, bottom = min(x1 + halo, world.width), min(y1 + halo, world.height)
+    view = world.region(lo, top, hi, bottom)
+    frozen = np.ones((bottom - top, hi - lo), dtype=bool)
+    frozen[y0 - top:y1 - top, x0 - lo:x1 - lo] = False
+    haloBefore = view.material[frozen]
+    local = moved[top:bottom, lo:hi].copy()
+    stepWorld(view, rng, local, frozen)
+    # Movers that landed in the halo must not move again when their own region steps
+    landed = np.zeros_like(frozen)
+    landed[frozen] = view.material[frozen] != haloBefore
+    moved[top:bottom, lo:hi] |= (local & ~frozen) | landed
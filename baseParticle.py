@@ -1,61 +1,86 @@
 import random
-from particleShaders import Randomize, Shimmer, Still
-import math
+from particleShaders import Randomize, Shimmer, Still, SHADERS, compileShaders
+from materials import MATERIAL_IDS, EMPTY, FLAMMABLE, registerClass
+from explosions import queueExplosion
 
 MAX_SHADER_VARIANTS = 5
-SHADER_CACHE = {}
-SHADER_CACHE_SPECIFICS = {}
+SHADER_CACHE_SPECIFICS = SHADERS  # material id -> compiled shader variants
+STEP_DT = 1 / 60  # seconds of simulated time per step of a grid that does not set its own
 
 # Base Particle Class
 class Particle:
+    type = "generic"  # Default type for particles, subclasses override it
+    materialId = EMPTY
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "type" in cls.__dict__:
+            cls.materialId = registerClass(cls)
+
     def __init__(self, x, y, flammable = False):
         self.x = x
         self.y = y
         self.shader = None
-        self.color = (0,0,0)
-        self.type = "generic"  # Default type for particles
+        self.shaderVariant = 0  # index of the shader in SHADERS[materialId], the particle's palette
+        self.baseColor = (0,0,0)  # color of particles without a shader
         self.flammable = flammable
         self.velocity = [0,0]
         self.gravity = 9.8
         self.burnChance = 0
         self.isExplosive = False
         self.isGas = False
+        self.lastTick = -1  # frame this particle was last updated in, so it only updates once per step
 
     def setUpShader(self, name, colors, shader_class, shader_args=None):
         if shader_args is None:
             shader_args = ()  # Default empty tuple
-        # Check if a new shader is needed
-        if self.shaderCache(name):
-            SHADER_CACHE_SPECIFICS[name].append(shader_class(colors, *shader_args))  # Dynamically instantiate shader
-        # Pick a random shader from cache
-        self.shader = random.choice(SHADER_CACHE_SPECIFICS[name])
-        self.color = self.shader.fetchColor()
+        shaders = compileShaders(self.materialId, name, colors, shader_class, shader_args, MAX_SHADER_VARIANTS)
+        # Pick a random variant
+        self.useShaderVariant(random.randrange(len(shaders)))
+
+    def useShaderVariant(self, variant):
+        self.shaderVariant = variant
+        self.shader = SHADERS[self.materialId][variant]
+
+    @property
+    def color(self):
+        if self.shader is None:
+            return self.baseColor
+        return self.shader.fetchColor()
+
+    @color.setter
+    def color(self, value):
+        # A fixed color replaces the shader
+        self.shader = None
+        self.baseColor = value
+
+    @staticmethod
+    def checksBounds(grid):
+        """Whether neighbour probes into grid need bounds tests, false for grids with a thick wall border (padding.py)."""
+        return getattr(grid, "boundsChecks", True)
+
+    @staticmethod
+    def stepLength(grid):
+        """Seconds of simulated time per step of grid, set by timestep.FixedTimestep.apply."""
+        return getattr(grid, "stepDt", STEP_DT)
+
+    def translate(self, dx, dy):
+        """Shift the particle's coordinates, used to move it in and out of a subgrid's frame."""
+        self.x += dx
+        self.y += dy
 
     def convertToLocal(self, columnOffset):
-        self.x = self.x - (columnOffset * 10)
+        self.translate(-columnOffset, 0)
 
     def convertToGlobal(self, columnOffset):
-        self.x = self.x + (columnOffset * 10)
+        self.translate(columnOffset, 0)
 
     def setCoordsForLocal(self, positionX, columnOffset):
-        self.x = positionX - (columnOffset * 10)
+        self.translate(positionX - columnOffset - self.x, 0)
 
     def getLoc(self):
         return (self.x, self.y)
 
-    def shaderCache(self, particleType):
-        if particleType in SHADER_CACHE:
-            numOfVariants = SHADER_CACHE[particleType]
-            if numOfVariants < MAX_SHADER_VARIANTS:
-                SHADER_CACHE[particleType] += 1
-                return True
-            else:
-                return False
-        else:
-            SHADER_CACHE[particleType] = 0
-            SHADER_CACHE_SPECIFICS[particleType] = []
-            return True
-
     def update(self, grid, dt = 1):
         pass
 
@@ -66,12 +91,17 @@ class Particle:
         return self.flammable
 
     def move(self, dx, dy, grid, checkMat=None, fluid=False):
-        """Move the particle if the target cell is empty or matches conditions."""
+        """
+        Move the particle if the target cell is empty or matches conditions.
+        checkMat is a material id, a table from materials indexed by id, or a type name.
+        """
         target_x, target_y = self.x + dx, self.y + dy
-        if not (0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid)):
+        if self.checksBounds(grid) and not (0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid)):
             return False  # Out of bounds
         target_cell = grid[target_y][target_x]
-        if checkMat == "Empty":
+        if checkMat.__class__ is str:
+            checkMat = MATERIAL_IDS[checkMat]
+        if checkMat == EMPTY:
             return target_cell is None  # Only return if the cell is empty
         if target_cell is None:
             if checkMat is None:
@@ -79,16 +109,20 @@ class Particle:
                 self.x, self.y = target_x, target_y
                 return True
             return False
-        if fluid and target_cell.getType() == self.getType():
+        if fluid and target_cell.materialId == self.materialId:
             return checkMat is None
-        return checkMat is not None and target_cell.getType() == checkMat
+        if checkMat is None:
+            return False
+        if checkMat.__class__ is int:
+            return target_cell.materialId == checkMat
+        return checkMat[target_cell.materialId]
     
     def checkFlammable(self, dx, dy, grid):
         target_x = self.x + dx
         target_y = self.y + dy
-        if 0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid):
+        if not self.checksBounds(grid) or (0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid)):
             if grid[target_y][target_x] != None:
-                if grid[target_y][target_x].getFlammable():
+                if FLAMMABLE[grid[target_y][target_x].materialId]:
                     return True
         return False
     
@@ -115,41 +149,5 @@ class Particle:
         del self
 
     def explode(self, grid, x, y, radius, emission):
-        from gases import Smoke
-        from travel import Travelling
-        from fire import Fire
-        for i in range(-radius, radius + 1):
-            for j in range(-radius, radius + 1):
-                target_x = x + i
-                target_y = y + j
-
-                # Check if target is within bounds
-                if 0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid):
-                    distance = math.sqrt(i**2 + j**2)  # Distance from explosion center
-
-                    if distance <= radius:
-                        if grid[target_y][target_x] is not None:
-                            old_particle = grid[target_y][target_x]  # Store old particle
-                            grid[target_y][target_x] = None  # Clear spot
-                            # Only fling particles that aren't Gunpowder or other explosives
-                            if old_particle.isExplosive == False and old_particle.isGas == False and old_particle.getType() != "Fire":
-                                if random.randint(0,2) == 1:
-                                    force = random.uniform(0.5, 1.5)  # Random explosion force
-                                    dx = i / distance  # Normalize push direction
-                                    dy = j / distance
-                                    grid[target_y][target_x] = Travelling(target_x, target_y, dx, dy, force, old_particle)
-
-                        # Add fire at the perimeter
-                        if radius - 0.5 <= distance <= radius + 0.5:  
-                            if grid[target_y][target_x] is None:
-                                grid[target_y][target_x] = Fire(target_x, target_y)  # Spawn fire particle
-
-                        # Push smoke outward
-                        if distance > 1:
-                            dx = int(i / distance * 2)  
-                            dy = int(j / distance * 2)
-                            new_x = target_x + dx
-                            new_y = target_y + dy
-                            if 0 <= new_x < len(grid[0]) and 0 <= new_y < len(grid):
-                                if grid[new_y][new_x] is None:
-                                    grid[new_y][new_x] = emission(new_x, new_y)  # Spawn smoke
\ No newline at end of file
+        """Queue a blast, applied with every other blast of the frame by explosions.resolveExplosions."""
+        queueExplosion(grid, x, y, radius, emission)
@@ -0,0 +1,201 @@
+"""
+Headless benchmark runner. Steps every canned scenario on every backend and
+reports steps per second, per-step latency percentiles and peak memory as JSON.
+
+    python benchmark.py --steps 200 --out results.json
+    python benchmark.py --scenarios sand_dump water_tank --backends objects arrays
+
+Peak memory is what tracemalloc sees in this process during a second, traced
+run of the scenario (worker processes of the multiprocess backend are not included).
+
+The array backends only simulate the materials in arrayKernels.KERNEL_MATERIALS.
+Scenarios that need anything else are not timed on them, their report entry lists
+the missing materials under "unsupported" instead.
+"""
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+import boids
+from engine import Engine, BACKENDS, ARRAY_BACKENDS
+from arrayKernels import KERNEL_MATERIALS
+from materials import MATERIAL_IDS
+
+
+def sandDump(world):
+    world.fill(0, 0, world.width - 1, world.height // 2, "Sand")
+
+
+def waterTank(world):
+    w, h = world.width, world.height
+    world.fill(10, h - 1, w - 11, h - 1, "Rock")
+    world.fill(10, h // 3, 10, h - 2, "Rock")
+    world.fill(w - 11, h // 3, w - 11, h - 2, "Rock")
+    world.fill(11, 0, w - 12, h // 3, "Water")
+
+
+def oilWaterLayering(world):
+    # Oil starts under the water and has to rise through it
+    w, h = world.width, world.height
+    world.fill(0, h // 2, w - 1, h - 1, "Oil")
+    world.fill(0, h // 4, w - 1, h // 2 - 1, "Water")
+
+
+def burningForest(world):
+    w, h = world.width, world.height
+    for trunk in range(5, w - 5, 12):
+        world.fill(trunk, h // 2, trunk + 1, h - 1, "Wood")  # trunk
+        world.fill(trunk - 4, h // 2 - 6, trunk + 5, h // 2 - 1, "Wood")  # crown
+    world.fill(0, h - 1, w - 1, h - 1, "Fire")
+
+
+def gunpowderChain(world):
+    w, h = world.width, world.height
+    world.fill(0, h - 20, w - 1, h - 1, "Gunpowder", 0.6)
+    world.fill(0, h - 21, 2, h - 21, "Fire")
+
+
+def acidOnPlants(world):
+    w, h = world.width, world.height
+    world.fill(0, h - 30, w - 1, h - 1, "Plant")
+    world.fill(0, 0, w - 1, 20, "Acid", 0.5)
+
+
+def grassiumSwarm(world):
+    w, h = world.width, world.height
+    boids.BOID_COUNT = 0  # the boid cap is global, start every run from an empty swarm
+    world.fill(0, h // 2, w - 1, h - 1, "Grassium", 0.4)
+    world.fill(w // 2 - 5, 0, w // 2 + 5, 10, "boid", 0.3)
+
+
+def chaosSpread(world):
+    w, h = world.width, world.height
+    world.fill(0, h // 2, w - 1, h - 1, "Sand", 0.5)
+    world.fill(0, h // 2, w - 1, h - 1, "Water", 0.5)
+    world.fill(w // 2 - 3, h // 2 - 8, w // 2 + 3, h // 2 - 2, "Chaos")
+
+
+SCENARIOS = {
+    "sand_dump": sandDump,
+    "water_tank": waterTank,
+    "oil_water_layering": oilWaterLayering,
+    "burning_forest": burningForest,
+    "gunpowder_chain": gunpowderChain,
+    "acid_on_plants": acidOnPlants,
+    "grassium_swarm": grassiumSwarm,
+    "chaos_spread": chaosSpread,
+}
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def buildWorld(scenario, backend, width, height, seed):
+    world = Engine(width, height, backend=backend, seed=seed)
+    SCENARIOS[scenario](world)
+    world.prepare()  # keep backend setup out of the timed steps
+    return world
+
+
+def unsupportedMaterials(scenario, width=100, height=100, seed=0):
+    """Materials the scenario places that the array kernels do not simulate, sorted by name."""
+    world = Engine(width, height, seed=seed)
+    SCENARIOS[scenario](world)
+    return sorted(name for name in world.counts() if not KERNEL_MATERIALS[MATERIAL_IDS[name]])
+
+
+def runScenario(scenario, backend, steps, width=100, height=100, seed=0):
+    world = buildWorld(scenario, backend, width, height, seed)
+    particles = world.count()
+    latencies = []
+    try:
+        start = time.perf_counter()
+        for _ in range(steps):
+            before = time.perf_counter()
+            world.step()
+            latencies.append(time.perf_counter() - before)
+        elapsed = time.perf_counter() - start
+        remaining = world.count()
+    finally:
+        world.close()
+
+    # Second run under tracemalloc, which would skew the timings above
+    tracemalloc.start()
+    world = buildWorld(scenario, backend, width, height, seed)
+    try:
+        world.step(steps)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        world.close()
+
+    ordered = sorted(latencies)
+    return {
+        "scenario": scenario,
+        "backend": backend,
+        "steps": steps,
+        "particlesStart": particles,
+        "particlesEnd": remaining,
+        "stepsPerSecond": steps / elapsed if elapsed else None,
+        "latencyMs": {
+            "mean": 1000 * elapsed / steps,
+            "p50": 1000 * percentile(ordered, 0.50),
+            "p90": 1000 * percentile(ordered, 0.90),
+            "p99": 1000 * percentile(ordered, 0.99),
+            "max": 1000 * ordered[-1],
+        },
+        "peakMemoryBytes": peak,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless simulation benchmarks")
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scenario in args.scenarios:
+        unsupported = unsupportedMaterials(scenario, seed=args.seed)
+        for backend in args.backends:
+            if backend in ARRAY_BACKENDS and unsupported:
+                # Timing a world that barely changes would read as a speedup
+                results.append({"scenario": scenario, "backend": backend, "steps": args.steps,
+                                "unsupported": unsupported})
+                print(f"{scenario:20} {backend:13} skipped, does not simulate {', '.join(unsupported)}")
+                continue
+            random.seed(args.seed)
+            try:
+                result = runScenario(scenario, backend, args.steps, seed=args.seed)
+            except Exception as error:  # keep benchmarking the other combinations, the report shows the failure
+                results.append({"scenario": scenario, "backend": backend, "steps": args.steps, "error": repr(error)})
+                print(f"{scenario:20} {backend:13} failed: {error!r}")
+                continue
+            results.append(result)
+            print(f"{scenario:20} {backend:13} {result['stepsPerSecond']:9.1f} steps/s  "
+                  f"p50 {result['latencyMs']['p50']:7.2f} ms  p99 {result['latencyMs']['p99']:7.2f} ms  "
+                  f"peak {result['peakMemoryBytes'] / 1e6:6.1f} MB")
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "steps": args.steps,
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import random
 import math
 from baseParticle import Particle
 from particleShaders import Flock
+from materials import EMPTY, BOID
 
 MAX_BOIDS = 100
 BOID_COUNT = 0
@@ -11,10 +12,11 @@ DIRECTIONS = [
 ]
 
 class Boid(Particle):
+    type = "boid"
+
     def __init__(self, x, y, avoidance_radius=2, flock_radius=4, separation_distance=2):
         super().__init__(x, y, True)
         global BOID_COUNT
-        self.type = "boid"
         self.speed = 2
         self.frameCount = 0
         self.avoidance_radius = avoidance_radius
@@ -22,8 +24,7 @@ class Boid(Particle):
         self.separation_distance = separation_distance
         self.currentDirection = random.choice(DIRECTIONS)
         self.setUpShader("Boid", [(255, 191, 205), (255, 31, 80)], Flock)
-        self.color = self.shader.fetchColor()
-        self.ogColor = self.color
+        self.ogVariant = self.shaderVariant
         self.flagForDelete = False
         BOID_COUNT += 1
         if (BOID_COUNT >= MAX_BOIDS):
@@ -46,7 +47,7 @@ class Boid(Particle):
         directions = [(0, 1), (0, -1), (-1, 0), (1, 0)]
         surrounded = True
         for direction in directions:
-            if self.move(direction[0], direction[1], grid, "Empty") or self.move(direction[0], direction[1], grid, "Boid"):
+            if self.move(direction[0], direction[1], grid, EMPTY) or self.move(direction[0], direction[1], grid, BOID):
                 surrounded = False
         if surrounded:
             self.delete_particle(grid)
@@ -54,9 +55,9 @@ class Boid(Particle):
         boids = self.get_radius_boids(grid)
         if boids:
             theChosenBoid = random.choice(boids)
-            self.color = theChosenBoid.getBoidColor()
+            self.useShaderVariant(theChosenBoid.shaderVariant)
         else:
-            self.color = self.ogColor
+            self.useShaderVariant(self.ogVariant)
         
 
 
@@ -89,7 +90,7 @@ class Boid(Particle):
         dx, dy = direction
         target_x, target_y = self.x + dx, self.y + dy
 
-        if 0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid):
+        if not self.checksBounds(grid) or (0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid)):
             return grid[target_y][target_x] is None and not self.is_obstacle_nearby(grid)
         return False
 
@@ -98,7 +99,7 @@ class Boid(Particle):
         for i in range(-self.avoidance_radius, self.avoidance_radius + 1):
             for j in range(-self.avoidance_radius, self.avoidance_radius + 1):
                 check_x, check_y = self.x + i, self.y + j
-                if 0 <= check_x < len(grid[0]) and 0 <= check_y < len(grid):
+                if not self.checksBounds(grid) or (0 <= check_x < len(grid[0]) and 0 <= check_y < len(grid)):
                     if grid[check_y][check_x] is not None and not isinstance(grid[check_y][check_x], Boid):
                         return True
         return False
@@ -109,7 +110,7 @@ class Boid(Particle):
         for i in range(-self.flock_radius, self.flock_radius + 1):
             for j in range(-self.flock_radius, self.flock_radius + 1):
                 check_x, check_y = self.x + i, self.y + j
-                if 0 <= check_x < len(grid[0]) and 0 <= check_y < len(grid):
+                if not self.checksBounds(grid) or (0 <= check_x < len(grid[0]) and 0 <= check_y < len(grid)):
                     obj = grid[check_y][check_x]
                     if isinstance(obj, Boid) and obj != self:
                         boids.append(obj)
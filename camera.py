@@ -0,0 +1,92 @@
+"""
+Camera over a world larger than the window. The camera decides which cells are
+drawn (a GridRenderer view), maps mouse positions to world cells for the brush,
+and tells the ChunkTracker what to simulate off screen:
+
+    FULL     every chunk updates every frame
+    REDUCED  chunks away from the view update every REDUCED_EVERY frames
+    FROZEN   chunks away from the view wait, with whatever woke them, until they are seen again
+
+Coordinates are world cells, the wall padding excluded, unless a function takes an offset.
+"""
+import math
+
+FULL, REDUCED, FROZEN = "full", "reduced", "frozen"
+POLICIES = (FULL, REDUCED, FROZEN)
+REDUCED_EVERY = 4  # frames per update of off-screen chunks under REDUCED
+SIM_MARGIN = 8  # cells around the view that always update, so nothing stalls at the screen edge
+MIN_CELL_SIZE, MAX_CELL_SIZE = 1, 32  # pixels per cell, zoom goes in powers of two between them
+
+
+class Camera:
+    def __init__(self, worldWidth, worldHeight, screenWidth, screenHeight, cellSize, policy=FULL):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown off-screen policy {policy!r}, expected one of {POLICIES}")
+        self.worldWidth, self.worldHeight = worldWidth, worldHeight
+        self.screenWidth, self.screenHeight = screenWidth, screenHeight
+        self.cellSize = cellSize
+        self.policy = policy
+        self.x = self.y = 0.0  # world position of the top left corner, fractional while panning
+
+    @property
+    def columns(self):
+        """Cells across the screen, the last one possibly cut off."""
+        return math.ceil(self.screenWidth / self.cellSize)
+
+    @property
+    def rows(self):
+        return math.ceil(self.screenHeight / self.cellSize)
+
+    @property
+    def origin(self):
+        return int(self.x), int(self.y)
+
+    def visibleRect(self):
+        """(x0, y0, x1, y1) world cells on screen, exclusive ends."""
+        x0, y0 = self.origin
+        return x0, y0, min(x0 + self.columns, self.worldWidth), min(y0 + self.rows, self.worldHeight)
+
+    def clamp(self):
+        # Keep the view on the world, a world smaller than the screen stays in the top left corner
+        self.x = min(max(self.x, 0.0), max(self.worldWidth - self.columns, 0))
+        self.y = min(max(self.y, 0.0), max(self.worldHeight - self.rows, 0))
+
+    def pan(self, dx, dy):
+        """Move the view by a number of screen pixels, like a mouse drag."""
+        self.x -= dx / self.cellSize
+        self.y -= dy / self.cellSize
+        self.clamp()
+
+    def centerOn(self, x, y):
+        self.x, self.y = x - self.columns / 2, y - self.rows / 2
+        self.clamp()
+
+    def zoomAt(self, steps, sx, sy):
+        """Zoom in (steps > 0) or out by powers of two, keeping the cell under screen pixel (sx, sy) in place."""
+        cellSize = min(max(self.cellSize * 2 ** steps, MIN_CELL_SIZE), MAX_CELL_SIZE)
+        if cellSize == self.cellSize:
+            return
+        wx, wy = self.x + sx / self.cellSize, self.y + sy / self.cellSize
+        self.cellSize = int(cellSize)
+        self.x, self.y = wx - sx / self.cellSize, wy - sy / self.cellSize
+        self.clamp()
+
+    def screenToWorld(self, sx, sy):
+        """World cell under a screen pixel, it may lie outside the world."""
+        x0, y0 = self.origin
+        return x0 + sx // self.cellSize, y0 + sy // self.cellSize
+
+    def applyView(self, renderer):
+        """Point a GridRenderer at the visible cells, resizing its buffers after a zoom."""
+        if (renderer.width, renderer.height, renderer.cellSize) != (self.columns, self.rows, self.cellSize):
+            renderer.resizeView(self.columns, self.rows, self.cellSize)
+        renderer.moveView(*self.origin)
+
+    def applyPolicy(self, tracker, frame, offset=0):
+        """Set the tracker's focus for this frame, offset being the grid's wall padding."""
+        if self.policy == FULL or (self.policy == REDUCED and frame % REDUCED_EVERY == 0):
+            tracker.clearFocus()
+            return
+        x0, y0, x1, y1 = self.visibleRect()
+        margin = SIM_MARGIN
+        tracker.setFocus(x0 + offset - margin, y0 + offset - margin, x1 + offset + margin - 1, y1 + offset + margin - 1)
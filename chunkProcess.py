@@ -1,13 +1,27 @@
+"""
+Pipelined sandbox: the simulation runs in its own process and step N + 1 is
+computed while the main process draws frame N.
+
+The simulation process owns the world (an engine.Engine) and writes the colors
+of every step into one of two shared-memory color buffers. Each frame the main
+process sends the brush strokes queued since the last frame and the buffer the
+simulation may write next, draws the other, read-only buffer, and then waits for
+the step to finish before swapping them. Strokes are applied between steps, so
+the simulation never sees a half painted brush.
+"""
 import multiprocessing
-import os
-import pygame
+from multiprocessing.shared_memory import SharedMemory
 import math
-from baseParticle import SHADER_CACHE_SPECIFICS  # Assuming this is defined elsewhere
+import numpy as np
+import pygame
+import particleShaders
+from particleShaders import advanceFrame, setFrame
 from stationary import Rock, Wood
 from fire import Fire
 from sand import Gunpowder, Sand
 from fluids import Acid, Water, Oil, Chaos, Void
-import sharedData  # If you're still using sharedData, adapt as needed
+from renderer import GridRenderer
+from profiler import PROFILER as prof
 
 # Constants
 GRID_WIDTH, GRID_HEIGHT = 100, 100
@@ -15,128 +29,154 @@ CELL_SIZE = 6
 WINDOW_WIDTH = GRID_WIDTH * CELL_SIZE
 WINDOW_HEIGHT = GRID_HEIGHT * CELL_SIZE
 EMPTY_COLOR = (0, 0, 0)
-grid = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+MAX_BRUSH_SIZE = 10
+FPS = 60
+PROFILE_PATH = "profile.json"  # where F4 dumps the profiler's samples
+BUFFER_SHAPE = (2, GRID_HEIGHT, GRID_WIDTH, 3)  # front and back color buffers, [buffer, y, x]
+
+strokes = []  # (x, y, particle_type) painted since the last step request
 brush_size = 1
-frame_counter = 0
 screen = None
 clock = None
+renderer = None
 
 def startScreenUp():
-    global screen, clock
+    global screen, clock, renderer
     pygame.init()
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
     pygame.display.set_caption("Atlantis Sandbox")
     clock = pygame.time.Clock()
-
-def update_shaders():
-    for key, value_list in SHADER_CACHE_SPECIFICS.items():
-        for item in value_list:
-            item.update()
-
-def draw_grid():
-    screen.fill(EMPTY_COLOR)
-    for y in range(GRID_HEIGHT - 1, -1, -1):
-        for x in range(GRID_WIDTH):
-            particle = grid[y][x]
-            if particle is not None:  # Check if particle is None
-                pygame.draw.rect(screen, particle.color,
-                                 (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-    pygame.display.flip()
+    renderer = GridRenderer(screen, GRID_WIDTH, GRID_HEIGHT, CELL_SIZE, EMPTY_COLOR)
+
+def draw_grid(colors):
+    renderer.fillFromColors(colors)
+    renderer.present()
+    if prof.overlay:
+        overlay = prof.drawOverlay(screen)
+        pygame.display.update(overlay)
+        renderer.damage(overlay)
+
+PARTICLE_TYPES = {
+    "sand": Sand, "water": Water, "rock": Rock, "acid": Acid,
+    "wood": Wood, "fire": Fire, "gunpowder": Gunpowder, "oil": Oil,
+    "chaos": Chaos, "void": Void
+}
 
 def create_particle(particle_type, x, y):
-    types = {
-        "sand": Sand, "water": Water, "rock": Rock, "acid": Acid,
-        "wood": Wood, "fire": Fire, "gunpowder": Gunpowder, "oil": Oil,
-        "chaos": Chaos, "void": Void
-    }
-    if particle_type in types:
-        return types[particle_type](x, y)
+    if particle_type in PARTICLE_TYPES:
+        return PARTICLE_TYPES[particle_type](x, y)
     else:
         print(f"Warning: Unknown particle type '{particle_type}'")
         return None
 
 def add_particle(x, y, particle_type):
+    """Queue a brush stroke, the simulation process places it before its next step."""
     if brush_size == 1:
-        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT and grid[y][x] is None:
-            grid[y][x] = create_particle(particle_type, x, y)
+        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
+            strokes.append((x, y, particle_type))
     else:
         for i in range(-brush_size, brush_size + 1):
             for j in range(-brush_size, brush_size + 1):
                 if math.sqrt(i**2 + j**2) <= brush_size:
                     nx, ny = x + i, y + j
-                    if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT and grid[ny][nx] is None:
-                        grid[ny][nx] = create_particle(particle_type, nx, ny)
-    sharedData.setGrid(grid) # If you're using sharedData, adapt as needed.
-
-def update_particle_logic(particle, grid): #New method to only update particle data.
-    if particle is not None:
-        return particle.update(grid) # Returns a new particle with updated data.
-    return None
-
-
-def update_grid_threaded(grid_queue, stop_event):
-    while not stop_event.is_set():
-        grid = grid_queue.get()  # Get the current grid from the queue
-        new_grid = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)] #Create a new grid so we don't modify the original while its being drawn.
-
-        for y in range(GRID_HEIGHT - 1, 0, -1):
-            for x in range(GRID_WIDTH):
-                particle = grid[y][x]
-                if particle is not None:
-                    new_particle = update_particle_logic(particle, grid) #Get the new particle data.
-                    new_grid[y][x] = new_particle #Set the new particle data in the new grid.
-
-        grid_queue.put(new_grid)  # Put the updated grid back in the queue
+                    if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT:
+                        strokes.append((nx, ny, particle_type))
+
+def fill_colors(out, grid, pad):
+    """Write the color of every world cell of a padded object grid into out[y, x]."""
+    colors = [particle.color if particle is not None else EMPTY_COLOR
+              for row in grid[pad:pad + GRID_HEIGHT] for particle in row[pad:pad + GRID_WIDTH]]
+    out[:] = np.array(colors, dtype=np.uint8).reshape(GRID_HEIGHT, GRID_WIDTH, 3)
+
+def simulate(bufferName, conn):
+    """Simulation process: wait for a step request, apply its strokes, step, fill the requested buffer."""
+    from engine import Engine  # only the simulation process needs the world
+    block = SharedMemory(name=bufferName)
+    buffers = np.ndarray(BUFFER_SHAPE, dtype=np.uint8, buffer=block.buf)
+    world = Engine(GRID_WIDTH, GRID_HEIGHT)
+    try:
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            back, animationFrame, painted = request
+            for x, y, particle_type in painted:
+                world.add(x, y, PARTICLE_TYPES[particle_type])
+            world.step()
+            setFrame(animationFrame)
+            fill_colors(buffers[back], world.grid, world.pad)
+            conn.send(back)
+    finally:
+        del buffers  # the view must go before the block can close
+        block.close()
+
+def handle_input(particle_type):
+    global brush_size
+    particle_map = {
+        pygame.K_s: "sand", pygame.K_w: "water", pygame.K_r: "rock",
+        pygame.K_a: "acid", pygame.K_t: "wood", pygame.K_f: "fire",
+        pygame.K_g: "gunpowder", pygame.K_o: "oil", pygame.K_c: "chaos",
+        pygame.K_v: "void"
+    }
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            return None
+        elif event.type == pygame.KEYDOWN:
+            if event.key in particle_map:
+                particle_type = particle_map[event.key]
+            elif event.key == pygame.K_UP:
+                brush_size = min(MAX_BRUSH_SIZE, brush_size + 1)
+            elif event.key == pygame.K_DOWN:
+                brush_size = max(1, brush_size - 1)
+            elif event.key == pygame.K_F3:
+                prof.toggle()
+                prof.overlay = prof.enabled
+            elif event.key == pygame.K_F4:
+                prof.dump(PROFILE_PATH)
+    if pygame.mouse.get_pressed()[0]:
+        mx, my = pygame.mouse.get_pos()
+        add_particle(mx // CELL_SIZE, my // CELL_SIZE, particle_type)
+    return particle_type
 
 def main():
-    global brush_size, frame_counter, grid
     startScreenUp()
-    running = True
     particle_type = "sand"
-    last_time = pygame.time.get_ticks()
-    
-    grid_queue = multiprocessing.Queue()
-    grid_queue.put(grid)  # Initialize the queue with the initial grid
-    stop_event = multiprocessing.Event()
-
-    update_thread = multiprocessing.Process(target=update_grid_threaded, args=(grid_queue, stop_event))
-    update_thread.start()
-
-    while running:
-        current_time = pygame.time.get_ticks()
-        dt = (current_time - last_time) / 1000.0  # You might use dt in particle updates later
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key in {pygame.K_s, pygame.K_w, pygame.K_r, pygame.K_a, pygame.K_t,
-                                    pygame.K_f, pygame.K_g, pygame.K_o, pygame.K_c, pygame.K_v}:
-                    particle_type = {pygame.K_s: "sand", pygame.K_w: "water", pygame.K_r: "rock",
-                                        pygame.K_a: "acid", pygame.K_t: "wood", pygame.K_f: "fire",
-                                        pygame.K_g: "gunpowder", pygame.K_o: "oil", pygame.K_c: "chaos",
-                                        pygame.K_v: "void"}[event.key]
-                elif event.key == pygame.K_UP:
-                    brush_size = min(10, brush_size + 1)
-                elif event.key == pygame.K_DOWN:
-                    brush_size = max(1, brush_size - 1)
-        if pygame.mouse.get_pressed()[0]:
-            mx, my = pygame.mouse.get_pos()
-            grid_x, grid_y = mx // CELL_SIZE, my // CELL_SIZE
-            add_particle(grid_x, grid_y, particle_type)
-
-        grid = grid_queue.get()
-        grid_queue.put(grid) #Put the grid back in the queue so the thread can continue to work.
-
-        update_shaders()
-        draw_grid()
-        clock.tick(60)
-    
-    stop_event.set()  # Signal the thread to stop
-    update_thread.join()  # Wait for the thread to finish
-    pygame.quit()
-
-    pygame.quit()
+    block = SharedMemory(create=True, size=int(np.prod(BUFFER_SHAPE)))
+    buffers = np.ndarray(BUFFER_SHAPE, dtype=np.uint8, buffer=block.buf)
+    buffers[:] = EMPTY_COLOR
+    conn, child = multiprocessing.Pipe()
+    simulation = multiprocessing.Process(target=simulate, args=(block.name, child), daemon=True)
+    simulation.start()
+    child.close()  # only the simulation holds it now, so recv raises EOFError if the simulation dies
+    front = 0  # the buffer being drawn, the simulation only ever writes the other one
+    try:
+        while True:
+            prof.beginFrame()
+            new_type = handle_input(particle_type)
+            prof.mark("input")
+            if new_type is None:
+                break
+            particle_type = new_type
+            advanceFrame()
+            # Start step N + 1 into the back buffer, then draw frame N from the front one meanwhile
+            conn.send((1 - front, particleShaders.FRAME, strokes[:]))
+            strokes.clear()
+            prof.mark("shaders")
+            draw_grid(buffers[front])
+            prof.mark("draw")
+            front = conn.recv()
+            prof.mark("update")  # time the step took beyond the draw, zero when rendering is the bottleneck
+            clock.tick(FPS)
+            prof.mark("wait")
+            prof.endFrame()
+    finally:
+        if simulation.is_alive():
+            conn.send(None)
+        simulation.join()
+        del buffers
+        block.close()
+        block.unlink()
+        pygame.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
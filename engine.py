@@ -0,0 +1,290 @@
+"""
+Headless simulation engine. Builds and steps a world without pygame, so the
+simulation can run in CI or on a render farm as well as behind a window.
+
+    world = Engine(100, 100, backend="objects")
+    world.fill(0, 0, 99, 49, Sand)
+    world.step(100)
+
+Backends:
+    objects       Particle objects updated one by one (main.py's loop)
+    arrays        ArrayGrid stepped by the NumPy kernels, only sands, fluids and gases move
+    multiprocess  column chunks updated by a process pool (multiProcessUpdate.py)
+    tiles         2D tiles in four checkerboard phases on a process pool, asleep tiles skipped
+    halo          column regions resident in persistent workers that exchange halos (haloExchange.py)
+    shared        ArrayGrid in shared memory, column bands stepped in place by workers (sharedWorld.py)
+    threads       ArrayGrid tiles stepped in place by a thread pool (threadedWorld.py)
+"""
+import multiprocessing
+import random
+import numpy as np
+import activity
+import padding
+import multiProcessUpdate
+import tracing
+import timestep
+from arrayGrid import ArrayGrid
+from arrayKernels import stepWorld
+from sharedWorld import SharedArrayGrid, SharedStepper
+from haloExchange import HaloStepper
+from threadedWorld import ThreadedStepper
+from materials import RESTLESS, EMPTY, MATERIALS, classFor, loadAll
+from explosions import resolveExplosions
+
+BACKENDS = ("objects", "arrays", "multiprocess", "tiles", "halo", "shared", "threads")
+ARRAY_BACKENDS = ("arrays", "shared", "threads")  # step an ArrayGrid with the NumPy kernels, see KERNEL_MATERIALS
+
+
+def newObjectWorld(width, height, chunks=True, sparse=False, thickness=padding.PADDING):
+    """
+    Padded TrackedGrid for a width x height world with its ChunkTracker and ActiveSet (None when disabled).
+    The tracker alone is the default: it costs a little while everything moves and skips settled regions
+    entirely. The ActiveSet only pays off for a few particles in a large empty world, without the tracker.
+    """
+    grid = padding.newPaddedGrid(width, height, thickness)
+    tracker = activity.ChunkTracker(width + 2 * thickness, height + 2 * thickness) if chunks else None
+    active = activity.ActiveSet(grid) if sparse else None
+    if tracker is not None:
+        tracker.watch(grid)
+    if active is not None:
+        grid.observers.append(active)
+    return grid, tracker, active
+
+
+def stepObjects(grid, pad, width, height, tracker=None, active=None):
+    """One simulation step of an object grid, bottom to top with alternating row directions."""
+    grid.frame += 1
+    if active is not None:
+        activeStep(grid, active, tracker)
+    elif tracker is not None:
+        chunkedStep(grid, tracker)
+    else:
+        for y in range(pad + height - 1, pad - 1, -1):
+            row_iter = range(pad, pad + width) if y % 2 == 0 else range(pad + width - 1, pad - 1, -1)
+            for x in row_iter:
+                if (particle := grid[y][x]) and particle.lastTick != grid.frame:
+                    particle.lastTick = grid.frame
+                    particle.update(grid)
+    resolveExplosions()
+
+
+def chunkedStep(grid, tracker):
+    # Only visit the dirty rectangles of awake chunks, keeping the bottom-to-top alternating order
+    tracker.beginFrame()
+    frame = grid.frame
+    for y, spans in tracker.awakeRows():
+        row = grid[y]
+        if y % 2 == 0:
+            cells = (x for start, end in spans for x in range(start, end + 1))
+        else:
+            cells = (x for start, end in reversed(spans) for x in range(end, start - 1, -1))
+        for x in cells:
+            if (particle := row[x]) and particle.lastTick != frame:
+                particle.lastTick = frame
+                particle.update(grid)
+                if RESTLESS[particle.materialId] and grid[particle.y][particle.x] is particle:
+                    tracker.keepAwake(particle.x, particle.y)
+
+
+def activeStep(grid, active, tracker=None):
+    # Only visit particles with behaviour, skipping the ones in sleeping chunks when a tracker is attached
+    if tracker is not None:
+        tracker.beginFrame()
+        rects, chunks_x, size = tracker.rects, tracker.chunksX, tracker.chunkSize
+    frame = grid.frame
+    for _, row in active.rows(tracker):
+        for particle in row:
+            x, y = particle.x, particle.y
+            if grid[y][x] is not particle or particle.lastTick == frame:
+                continue  # removed, replaced or already updated earlier this frame
+            if tracker is not None:
+                rect = rects[(y // size) * chunks_x + x // size]
+                if rect is None or not (rect[0] <= x <= rect[2] and rect[1] <= y <= rect[3]):
+                    continue
+            particle.lastTick = frame
+            particle.update(grid)
+            if tracker is not None and RESTLESS[particle.materialId] and grid[particle.y][particle.x] is particle:
+                tracker.keepAwake(particle.x, particle.y)
+
+
+class Engine:
+    """A width x height world and the backend that steps it. Coordinates are world cells, padding excluded."""
+
+    def __init__(self, width=100, height=100, backend="objects", chunks=True, sparse=False,
+                 thickness=padding.PADDING, seed=None, processes=None, chunkWidth=None,
+                 tileSize=multiProcessUpdate.TILE_SIZE, stepsPerSecond=timestep.STEPS_PER_SECOND):
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown backend {backend!r}, expected one of {BACKENDS}")
+        loadAll()
+        self.width, self.height = width, height
+        self.backend = backend
+        self.frame = 0
+        self.processes = processes  # worker processes (threads for "threads"), None uses os.cpu_count()
+        self.chunkWidth = chunkWidth
+        self.layout = None
+        self.pool = None
+        self.stepper = None
+        self.seed = seed or 0
+        self.world = None  # ArrayGrid of the arrays and shared backends, built on the first step
+        self.rng = np.random.default_rng(seed)
+        if seed is not None:
+            random.seed(seed)
+        if backend in ("multiprocess", "tiles", "halo"):
+            # Workers receive plain pickled rows, a TrackedGrid's observers would be pickled along
+            self.pad = thickness
+            self.grid = padding.padGrid([[None] * width for _ in range(height)], thickness)
+            self.tracker = self.active = None
+            if backend == "tiles":
+                # Fed by reassembleTiles rather than observing the grid
+                self.tracker = activity.ChunkTracker(len(self.grid[0]), len(self.grid))
+                self.layout = multiProcessUpdate.TileLayout(len(self.grid[0]), len(self.grid), tileSize,
+                                                            workers=processes)
+            else:
+                self.layout = multiProcessUpdate.ChunkLayout(len(self.grid[0]), chunkWidth, workers=processes)
+        else:
+            self.pad = thickness
+            self.grid, self.tracker, self.active = newObjectWorld(width, height, chunks, sparse, thickness)
+        # Read by particles through Particle.stepLength, worker windows copy it, see padding.window
+        self.grid.stepDt = 1.0 / stepsPerSecond
+
+    def add(self, x, y, particleClass):
+        """
+        Place a particle in an empty cell, particleClass being a Particle subclass or a material name.
+        Returns the particle, None when the cell is taken. Once the arrays, shared, threads or halo
+        world is built it only stores a copy of the particle, the returned object is not simulated.
+        """
+        if isinstance(particleClass, str):
+            particleClass = classFor(particleClass)
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        gx, gy = x + self.pad, y + self.pad
+        if self.world is not None:
+            # The ArrayGrid replaced self.grid, which only held the starting particles
+            if self.world.material[gy, gx] != EMPTY:
+                return None
+            particle = particleClass(gx, gy)
+            self.world.setParticle(gx, gy, particle)
+            return particle
+        if self.backend == "halo" and self.stepper is not None:
+            self.sync()
+            if self.grid[gy][gx] is not None:
+                return None
+            # Pickled to the owning worker, the gathered grid only keeps count() right until the next step
+            particle = self.grid[gy][gx] = particleClass(gx, gy)
+            self.stepper.place(gx, gy, particle)
+            return particle
+        if self.grid[gy][gx] is not None:
+            return None
+        particle = self.grid[gy][gx] = particleClass(gx, gy)
+        if self.backend == "tiles":
+            self.tracker.cellChanged(gx, gy, None, particle)
+        return particle
+
+    def fill(self, x0, y0, x1, y1, particleClass, chance=1.0):
+        """add() over the inclusive rectangle, each cell with the given probability."""
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                if chance >= 1.0 or random.random() < chance:
+                    self.add(x, y, particleClass)
+
+    def prepare(self):
+        """Build the backend state (ArrayGrid, process pool) now instead of on the first step."""
+        if self.backend == "arrays" and self.world is None:
+            self.world = ArrayGrid.fromParticles(self.grid, self.pad)
+        elif self.backend in ("multiprocess", "tiles") and self.pool is None:
+            self.pool = multiprocessing.Pool(processes=self.layout.workers)
+        elif self.backend == "shared" and self.stepper is None:
+            self.world = SharedArrayGrid.fromParticles(self.grid, self.pad)
+            self.stepper = SharedStepper(self.world, self.processes, self.seed)
+        elif self.backend == "threads" and self.stepper is None:
+            self.world = ArrayGrid.fromParticles(self.grid, self.pad)
+            self.stepper = ThreadedStepper(self.world, workers=self.processes, seed=self.seed)
+        elif self.backend == "halo" and self.stepper is None:
+            self.stepper = HaloStepper(self.grid, self.layout)
+
+    def step(self, steps=1):
+        for _ in range(steps):
+            self.frame += 1
+            if self.backend == "objects":
+                stepObjects(self.grid, self.pad, self.width, self.height, self.tracker, self.active)
+            elif self.backend == "arrays":
+                self.stepArrays()
+            elif self.backend in ("shared", "threads"):
+                self.prepare()
+                self.stepper.step()
+            elif self.backend == "halo":
+                self.prepare()
+                self.stepper.step(self.frame)
+                self.grid = None  # the workers hold the particles now, see sync
+            else:
+                self.stepMultiprocess()
+
+    def stepArrays(self):
+        self.prepare()
+        stepWorld(self.world, self.rng)
+
+    def stepMultiprocess(self):
+        self.prepare()
+        layout, tracker = self.layout, self.tracker
+        if tracker is not None:
+            tracker.beginFrame()
+        for phase, indices in enumerate(layout.phases):
+            indices = [i for i in indices if layout.isAwake(i, tracker)]
+            if not indices:
+                continue
+            tasks = [layout.task(self.grid, i, self.frame) for i in indices]
+            with tracing.span("map chunks", phase=phase):
+                if tracing.ENABLED:
+                    sections = []
+                    for section, events in self.pool.map(multiProcessUpdate.traced_update, tasks):
+                        tracing.merge(events)
+                        sections.append(section)
+                else:
+                    sections = self.pool.map(layout.update, tasks)
+            with tracing.span("reassemble"):
+                self.grid = layout.reassemble(self.grid, sections, indices, tracker)
+
+    def sync(self):
+        """Gather the halo workers' particles into self.grid, a copy that is dropped on the next step."""
+        if self.grid is None:
+            if self.stepper is None:
+                raise RuntimeError("the halo workers were closed with the particles, sync() before close()")
+            self.grid = self.stepper.gather()
+
+    def count(self):
+        """Occupied cells inside the border."""
+        self.sync()
+        if self.world is not None:
+            pad = self.world.padding
+            return int(np.count_nonzero(self.world.material[pad:self.world.height - pad, pad:self.world.width - pad]))
+        pad = self.pad
+        return sum(particle is not None for row in self.grid[pad:pad + self.height]
+                   for particle in row[pad:pad + self.width])
+
+    def counts(self):
+        """Occupied cells inside the border per material name."""
+        self.sync()
+        totals = {}
+        if self.world is not None:
+            pad = self.world.padding
+            ids, amounts = np.unique(self.world.material[pad:self.world.height - pad, pad:self.world.width - pad],
+                                     return_counts=True)
+            return {MATERIALS[int(i)]: int(n) for i, n in zip(ids, amounts) if i != EMPTY}
+        pad = self.pad
+        for row in self.grid[pad:pad + self.height]:
+            for particle in row[pad:pad + self.width]:
+                if particle is not None:
+                    totals[particle.type] = totals.get(particle.type, 0) + 1
+        return totals
+
+    def close(self):
+        if self.stepper is not None:
+            self.stepper.close()
+            if self.backend == "shared":
+                self.world.close()
+                self.world = None
+            self.stepper = None
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
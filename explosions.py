@@ -0,0 +1,111 @@
+"""
+Explosion stencils and the per-frame explosion queue. Particle.explode only
+queues a blast, and resolveExplosions applies every queued blast of the frame
+in a single pass over the cells they cover.
+"""
+import math
+import random
+from materials import CLASSES, FIRE, INDESTRUCTIBLE, TRAVELLING
+
+STENCILS = {}
+PENDING = []  # (grid, x, y, radius, emission) queued this frame
+
+
+class Stencil:
+    """Offsets of a radius, with everything explode() needs precomputed per offset."""
+
+    def __init__(self, radius):
+        self.radius = radius
+        self.cells = []  # (i, j, distance, pushX, pushY, onRing, smokeOffset)
+        self.ring = []
+        for i in range(-radius, radius + 1):
+            for j in range(-radius, radius + 1):
+                distance = math.sqrt(i**2 + j**2)  # Distance from explosion center
+                if distance > radius:
+                    continue
+                pushX, pushY = (i / distance, j / distance) if distance else (0.0, 0.0)
+                onRing = radius - 0.5 <= distance
+                smokeOffset = (int(i / distance * 2), int(j / distance * 2)) if distance > 1 else None
+                self.cells.append((i, j, distance, pushX, pushY, onRing, smokeOffset))
+                if onRing:
+                    self.ring.append((i, j))
+
+
+def getStencil(radius):
+    stencil = STENCILS.get(radius)
+    if stencil is None:
+        stencil = STENCILS[radius] = Stencil(radius)
+    return stencil
+
+
+def queueExplosion(grid, x, y, radius, emission):
+    PENDING.append((grid, x, y, radius, emission))
+
+
+def resolveExplosions():
+    """Apply every queued blast, merging the ones that overlap on the same grid."""
+    if not PENDING:
+        return
+    blasts = {}
+    for grid, x, y, radius, emission in PENDING:
+        blasts.setdefault(id(grid), (grid, {}))[1][(x, y, radius)] = emission  # same blast twice counts once
+    PENDING.clear()
+    for grid, merged in blasts.values():
+        applyBlasts(grid, merged)
+
+
+def applyBlasts(grid, blasts):
+    """
+    blasts maps (x, y, radius) to the gas class it emits. Each covered cell is
+    cleared once, pushed away from the nearest blast centre, and only gets fire if
+    it lies on the edge of the merged area rather than inside another blast.
+    Smoke is dropped where the old cell-by-cell explode would have cleared it again.
+    """
+    Travelling = CLASSES[TRAVELLING]
+    Fire = CLASSES[FIRE]
+    width, height = len(grid[0]), len(grid)
+    covered = {}  # (x, y) -> (distance, pushX, pushY, smokeOffset, emission), in stencil order
+    burning = set()
+    inner = set()
+    for (x, y, radius), emission in blasts.items():
+        # Only blasts reaching past the grid edge (smoke included) need per-cell bounds tests
+        clip = not (radius + 2 <= x < width - radius - 2 and radius + 2 <= y < height - radius - 2)
+        for i, j, distance, pushX, pushY, onRing, smokeOffset in getStencil(radius).cells:
+            target_x, target_y = x + i, y + j
+            if clip and not (0 <= target_x < width and 0 <= target_y < height):
+                continue
+            cell = (target_x, target_y)
+            if onRing:
+                burning.add(cell)
+            else:
+                inner.add(cell)
+            nearest = covered.get(cell)
+            if nearest is None or distance < nearest[0]:
+                covered[cell] = (distance, pushX, pushY, smokeOffset, emission)
+
+    # Clear the area, flinging anything that is not explosive, a gas or fire
+    for (target_x, target_y), (distance, pushX, pushY, smokeOffset, emission) in covered.items():
+        old_particle = grid[target_y][target_x]
+        if old_particle is None or INDESTRUCTIBLE[old_particle.materialId]:
+            continue
+        grid[target_y][target_x] = None
+        if old_particle.isExplosive == False and old_particle.isGas == False and old_particle.materialId != FIRE:
+            if random.randint(0, 2) == 1:
+                force = random.uniform(0.5, 1.5)  # Random explosion force
+                grid[target_y][target_x] = Travelling(target_x, target_y, pushX, pushY, force, old_particle)
+
+    # Add fire at the perimeter of the merged area
+    for target_x, target_y in burning - inner:
+        if grid[target_y][target_x] is None:
+            grid[target_y][target_x] = Fire(target_x, target_y)  # Spawn fire particle
+
+    # Push smoke outward, skipping covered cells visited later, which explode() used to clear after the smoke landed
+    order = {cell: index for index, cell in enumerate(covered)}
+    for index, ((target_x, target_y), (distance, pushX, pushY, smokeOffset, emission)) in enumerate(covered.items()):
+        if smokeOffset is None:
+            continue
+        new_x, new_y = target_x + smokeOffset[0], target_y + smokeOffset[1]
+        if order.get((new_x, new_y), -1) > index:
+            continue
+        if 0 <= new_x < width and 0 <= new_y < height and grid[new_y][new_x] is None:
+            grid[new_y][new_x] = emission(new_x, new_y)  # Spawn smoke
@@ -3,19 +3,19 @@ from particleShaders import Still, Randomize, Shimmer
 import random
 import math
 from gases import Steam, Smoke
+from materials import BURN_CHANCE, GUNPOWDER, WATER
 
 class Fire(Particle):
+    type = "Fire"
+
     def __init__(self, x, y):
         super().__init__(x, y)  # Fire color
-        self.type = "Fire"
         self.falling = False
         self.spawnedSmoke = False
         self.lifeTime = random.randint(100,400)
         self.setUpShader("Fire", [(237, 71, 38),(237, 164, 38)], Randomize, (5,))
 
     def update(self, grid):
-        # Fetch color for fire animation
-        self.color = self.shader.fetchColor()
         self.lifeTime -= 1
         if self.lifeTime <= 0:
             self.delete_particle(grid)
@@ -31,10 +31,10 @@ class Fire(Particle):
         directions = [(0, 1), (0, -1), (-1, 0), (1, 0)]
         for dx, dy in directions:
             if self.checkFlammable(dx, dy, grid):
-                if grid[self.y + dy][self.x + dx].getType() == "Gunpowder":
+                if grid[self.y + dy][self.x + dx].materialId == GUNPOWDER:
                     grid[self.y + dy][self.x + dx].explode(grid, self.x + dx, self.y + dy, 5, Smoke)
                     return
-                if random.randint(0, grid[self.y + dy][self.x + dx].burnChance) == 0:
+                if random.randint(0, BURN_CHANCE[grid[self.y + dy][self.x + dx].materialId]) == 0:
                     particle = Fire(self.x + dx, self.y + dy)
                     if  grid[self.y + dy][self.x + dx] is not None:
                         grid[self.y + dy][self.x + dx].delete_and_replace(grid, particle)
@@ -45,9 +45,9 @@ class Fire(Particle):
             target_x = self.x + dx
             target_y = self.y + dy
             if (
-                0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid)
+                (not self.checksBounds(grid) or (0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid)))
                 and grid[target_y][target_x] is not None
-                and grid[target_y][target_x].getType() == "Water"
+                and grid[target_y][target_x].materialId == WATER
             ):
                 # Spawn steam at fire location
                 if (random.randint(0,3) == 1):
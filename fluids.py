@@ -1,10 +1,14 @@
 from baseParticle import Particle, SHADER_CACHE_SPECIFICS
 from particleShaders import Still, Randomize, Shimmer
-from gases import MysteriousVapor
+from gases import MysteriousVapor, Grassium
+from materials import (ACID, CHAOS, CLASSES, EMPTY, FLUID_SINKS_THROUGH, GRAVEL, INDESTRUCTIBLE, IS_FLUID,
+                       IS_GAS, IS_SAND, MULCH, OIL, PLANT, ROCK, SAND, VOID, WATER, WOOD, classesWhere, table)
 import random
 import math
 
-LISTOFSANDS = ["Sand", "Gunpowder", "Mulch", "Gravel"]
+ACID_DISSOLVES = table("Wood", "Mulch")
+SLIME_SINKS_THROUGH = table("Oil", "Water", "Acid")
+SLIME_REACTS_WITH = [GRAVEL, SAND, MULCH]
 
 class Fluid(Particle):
     def __init__(self, x, y, flammable=False, spread=1):
@@ -13,17 +17,15 @@ class Fluid(Particle):
 
     def update(self, grid):
         x, y = self.x, self.y  # Cache attributes
-        self.color = self.shader.fetchColor()
         if y < len(grid[0]):
             below = y + 1
-            if self.move(0, 1, grid, "Smoke") or self.move(0, 1, grid, "Steam"):
+            if self.move(0, 1, grid, FLUID_SINKS_THROUGH):
                 self.swap(self, grid[below][x], grid)
                 return True
         above = y - 1
-        for sands in LISTOFSANDS:
-            if self.move(0, -1, grid, sands):
-                self.swap(self, grid[above][x], grid)
-                return True
+        if self.move(0, -1, grid, IS_SAND):
+            self.swap(self, grid[above][x], grid)
+            return True
         if self.move(0, 1, grid):
             return True 
         move_left, move_right = self.move(-1, 1, grid), self.move(1, 1, grid)
@@ -46,12 +48,12 @@ class Fluid(Particle):
             return False
         target_x = self.x + dx * self.spread
         target_y = self.y + dy * self.spread 
-        if not (0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid)):
+        if self.checksBounds(grid) and not (0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid)):
             return False
         step_range = range(0, dx * self.spread + (1 if dx > 0 else -1), (1 if dx > 0 else -1))
         for i in step_range:
             if i != 0 and grid[self.y][self.x + i] is not None:
-                if grid[self.y][self.x + i].getType() != self.getType():
+                if grid[self.y][self.x + i].materialId != self.materialId:
                     return False
         if grid[self.y][target_x] is None:
             grid[self.y][self.x] = None
@@ -60,24 +62,23 @@ class Fluid(Particle):
             return True
         return False
         
-    def fluidUnderFluid(self, grid, listOfMaterials):
-        for material in listOfMaterials:
-            if self.move(0, 1, grid, material):
-                self.swap(self, grid[self.y + 1][self.x], grid)
+    def fluidUnderFluid(self, grid, materials):
+        """materials is a material id or table of the fluids this one sinks under."""
+        if self.move(0, 1, grid, materials):
+            self.swap(self, grid[self.y + 1][self.x], grid)
         moves = []
         for i in [1, 0]:  # Check below first, then same level
-            for material in listOfMaterials:
-                # Check left and right movement
-                if self.move(-1, i, grid, material):
-                    moves.append((-1, i))
-                if self.move(1, i, grid, material):
-                    moves.append((1, i))
-                # If valid moves exist, randomly pick one
+            # Check left and right movement
+            if self.move(-1, i, grid, materials):
+                moves.append((-1, i))
+            if self.move(1, i, grid, materials):
+                moves.append((1, i))
             if i == 0:
-                if self.move(-1, i, grid, self.getType()):
+                if self.move(-1, i, grid, self.materialId):
                     moves.append((-1, i))
-                if self.move(1, i, grid, self.getType()):
+                if self.move(1, i, grid, self.materialId):
                     moves.append((1, i))
+        # If valid moves exist, randomly pick one
         if moves:
             direction, height = random.choice(moves)
             self.swap(self, grid[self.y + height][self.x + direction], grid)
@@ -91,56 +92,56 @@ SUBCLASSES OF FLUID
 """
 
 class Water(Fluid):
+    type = "Water"
+
     def __init__(self, x, y):
         super().__init__(x, y, spread = 3)
-        self.type = "Water"
         self.setUpShader("Water", [(0, 119, 190),(6, 88, 138)], Shimmer, (0.01,))
 
     def update(self, grid):
         super().update(grid)
-        if self.move(0, 1, grid, "Acid"):  # check acid
+        if self.move(0, 1, grid, ACID):  # check acid
             particle = Water(self.x, self.y + 1)
             grid[self.y + 1][self.x].delete_and_replace(grid, particle)
             return
-        if self.fluidUnderFluid(grid, ["Oil"]):
+        if self.fluidUnderFluid(grid, OIL):
             return
 
         
 class Acid(Fluid):
+    type = "Acid"
+
     def __init__(self, x, y):
         super().__init__(x, y, flammable=True, spread = 2) 
-        self.type = "Acid"
         self.burnChance = 10
         self.setUpShader("Acid", [(40, 166, 33),(93, 184, 61)], Shimmer, (0.01,))
     
     def update(self, grid):
-        dissolveMats = ["Wood", "Mulch"]
-        for mat in dissolveMats:
-            if self.move(0, 1, grid, mat): #check for Wood
-                grid[self.y + 1][self.x].delete_particle(grid)
-                return
-        if self.move(0, 1, grid, "Water"): #check for Water
+        if self.move(0, 1, grid, ACID_DISSOLVES): #check for Wood
+            grid[self.y + 1][self.x].delete_particle(grid)
+            return
+        if self.move(0, 1, grid, WATER): #check for Water
             particle = Water(self.x, self.y)
             grid[self.y][self.x].delete_and_replace(grid, particle)
             return 
-        if self.move(0, 1, grid, "Plant"):
-            from gases import Grassium
+        if self.move(0, 1, grid, PLANT):
             particle = Grassium(self.x, self.y + 1)
             grid[self.y + 1][self.x].delete_and_replace(grid, particle)
         if super().update(grid):
             return
 
 class Oil(Fluid):
+    type = "Oil"
+
     def __init__(self, x, y):
         super().__init__(x, y, True, spread = 2)
-        self.type = "Oil"
         self.burnChance = 2
         self.setUpShader("Oil", [(201, 116, 60),(150, 73, 23)], Shimmer, (0.02,))
     
     def update(self, grid):
         directions = [(0, 1), (0, -1), (-1, 0), (1, 0)]
         for dx, dy in directions:
-            if self.move(dx, dy, grid, "Acid"):
+            if self.move(dx, dy, grid, ACID):
                 particle = Slime(self.x, self.y)
                 grid[self.y + dy][self.x + dx].delete_particle(grid)
                 self.delete_and_replace(grid, particle)
@@ -149,9 +150,10 @@ class Oil(Fluid):
             return
 
 class Slime(Fluid):
+    type = "Slime"
+
     def __init__(self, x, y):
         super().__init__(x, y) 
-        self.type = "Slime"
         self.isExplosive = True
         self.setUpShader("Slime", [(218, 16, 222), (189, 21, 102)], Shimmer, (0.02,))
 
@@ -160,72 +162,63 @@ class Slime(Fluid):
             return 
         if random.randint(0,5) == 4: #slow how fast it moves
             super().update(grid)
-            if self.fluidUnderFluid(grid, ["Oil", "Water", "Acid"]):
+            if self.fluidUnderFluid(grid, SLIME_SINKS_THROUGH):
                 return
         directions = [(0, 1), (0, -1), (-1, 0), (1, 0)]
-        mats = ["Gravel", "Sand", "Mulch"]
-        for mat in mats:
+        for mat in SLIME_REACTS_WITH:
             for dx, dy in directions:
                 if self.move(dx, dy, grid, mat):
                     self.explode(grid, self.x, self.y, 20, MysteriousVapor)
                     return
 
 class Chaos(Fluid):
+    type = "Chaos"
+    replacements = None  # (gases, sands, fluids, solids), filled on first use once every module is loaded
+
     def __init__(self, x, y):
         super().__init__(x, y, spread = 5) 
-        self.type = "Chaos"
         self.setUpShader("Chaos", [(252, 249, 136), (250, 242, 5)], Shimmer, (0.02,)) 
-        from gases import Gas
-        from sand import BaseSand
-        from stationary import Rock, Wood
-        self.gas = list(self.get_all_subclasses(Gas))
-        self.sands = list(self.get_all_subclasses(BaseSand))
-        self.fluids = list(self.get_all_subclasses(Fluid))
-        self.fluids.remove(Chaos)
-        
-    def get_all_subclasses(self, cls):
-            subclasses = set(cls.__subclasses__())  # Get direct subclasses
-            for subclass in cls.__subclasses__():
-                subclasses.update(self.get_all_subclasses(subclass))  # Recursively get subclasses
-            return subclasses 
+
+    @classmethod
+    def get_replacements(cls):
+        if cls.replacements is None:
+            fluids = [fluid for fluid in classesWhere(IS_FLUID) if fluid is not Chaos]
+            cls.replacements = (classesWhere(IS_GAS), classesWhere(IS_SAND), fluids, [CLASSES[ROCK], CLASSES[WOOD]])
+        return cls.replacements
 
     def update(self, grid):
-        from gases import Gas
-        from sand import BaseSand
-        from stationary import Rock, Wood
+        gases, sands, fluids, solids = self.get_replacements()
         directions = [(0, 1), (0, -1), (-1, 0), (1, 0)]
         for dx, dy in directions:
             new_x, new_y = self.x + dx, self.y + dy
             # Ensure the new position is within bounds
-            if 0 <= new_x < len(grid[0]) and 0 <= new_y < len(grid):
+            if not self.checksBounds(grid) or (0 <= new_x < len(grid[0]) and 0 <= new_y < len(grid)):
                 # Attempt movement first
-                if not self.move(dx, dy, grid, "Empty"):
-                    if grid[new_y][new_x] is not None and not isinstance(grid[new_y][new_x], Chaos):
-                        if isinstance(grid[new_y][new_x], Gas):
-                            particle = random.choice(self.gas)(self.x+dx, self.y+dy)
-                        elif isinstance(grid[new_y][new_x], BaseSand):
-                            particle = random.choice(self.sands)(self.x+dx, self.y+dy)
-                        elif isinstance(grid[new_y][new_x], Fluid):
-                            particle = random.choice(self.fluids)(self.x+dx, self.y+dy)
-                        elif isinstance(grid[new_y][new_x], Particle):
-                            particle = random.choice([Rock, Wood])(self.x+dx, self.y+dy)
-                        else:
-                            particle = None  # Fallback case
-
-                        # Only place the new particle if it's valid
-                        if particle:
-                            grid[new_y][new_x] = particle
+                if not self.move(dx, dy, grid, EMPTY):
+                    target = grid[new_y][new_x].materialId
+                    if target == CHAOS or INDESTRUCTIBLE[target]:
+                        continue
+                    if IS_GAS[target]:
+                        particle = random.choice(gases)(new_x, new_y)
+                    elif IS_SAND[target]:
+                        particle = random.choice(sands)(new_x, new_y)
+                    elif IS_FLUID[target]:
+                        particle = random.choice(fluids)(new_x, new_y)
+                    else:
+                        particle = random.choice(solids)(new_x, new_y)
+                    grid[new_y][new_x] = particle
 
         # Call parent class update
         if super().update(grid):
             return
 
 class Void(Fluid): 
+    type = "Void"
+
     def __init__(self, x, y, flammable=False, spread=3):
         super().__init__(x, y, flammable, spread)
         self.lifeTime = 0
         self.maxLifeTime = 170
-        self.type = "Void"
         self.setUpShader("Void", [(0, 92, 105), (0, 223, 255)], Shimmer, (0.02,))
 
     def update(self, grid):
@@ -237,8 +230,8 @@ class Void(Fluid):
         for direction in directions:
             target_x = self.x + direction[0]
             target_y = self.y + direction[1]
-            if not self.move(direction[0], direction[1], grid, "Empty") and (0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid)): 
-                if not self.move(direction[0], direction[1], grid, "Void"):
+            if not self.move(direction[0], direction[1], grid, EMPTY) and (not self.checksBounds(grid) or (0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid))): 
+                if not self.move(direction[0], direction[1], grid, VOID) and not self.move(direction[0], direction[1], grid, INDESTRUCTIBLE):
                     grid[target_y][target_x].delete_particle(grid)
                     grid[target_y][target_x] = None
                     grid[self.y][self.x] = None
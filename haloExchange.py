@@ -0,0 +1,194 @@
+"""
+Halo-exchange backend for the object grid. Each of the layout's workers
+permanently owns a region of columns, a run of consecutive chunk pairs 2k and
+2k + 1 of a ChunkLayout, and keeps its particles resident between frames in
+region-local coordinates. Nothing but boundary columns crosses between workers:
+
+    phase 0  every worker updates its even chunks, then sends the columns
+             [start - halo, start + halo) around its left edge to its left
+             neighbour, movers that crossed into the neighbour included
+    phase 1  every worker updates its odd chunks and sends the columns
+             around its right edge to its right neighbour
+
+Chunks of one phase are at least 2 * halo apart, so the columns a worker sends
+are never written by the receiver in the same phase. After both phases each
+worker returns the colors of the cells it owns, which is all the main process
+needs to draw a frame.
+"""
+import numpy as np
+from multiprocessing import Pipe, Process
+import particleShaders
+import padding
+from baseParticle import Particle
+from explosions import resolveExplosions
+from multiProcessUpdate import ChunkLayout
+
+EMPTY_COLOR = (0, 0, 0)
+
+
+def translateColumns(columns, dx):
+    for row in columns:
+        for cell in row:
+            if cell is not None:
+                cell.translate(dx, 0)
+
+
+class Region:
+    """A worker's resident part of the grid: owned columns [start, end) plus halos, stored from column lo."""
+
+    def __init__(self, columns, layout, first, last):
+        self.layout = layout
+        self.chunks = layout.chunks[first:last]  # first is even, so phase p updates chunks[p::2]
+        self.start, self.end = self.chunks[0][0], self.chunks[-1][1]
+        self.lo = max(self.start - layout.halo, 0)
+        self.hi = min(self.end + layout.halo, layout.width)
+        self.grid = columns
+        translateColumns(self.grid, -self.lo)
+
+    def updateChunks(self, phase, frame):
+        """Update the owned cells of the even (phase 0) or odd chunks bottom to top, one chunk after another."""
+        grid, lo = self.grid, self.lo
+        for start, end in self.chunks[phase::2]:
+            for y in range(len(grid) - 1, -1, -1):
+                row = grid[y]
+                for x in range(start - lo, end - lo):
+                    cell = row[x]
+                    if cell is not None and cell.lastTick != frame:
+                        cell.lastTick = frame
+                        cell.update(grid)
+            resolveExplosions()
+
+    def edge(self, edge):
+        """Global (a, b) column range around the region's left (0) or right (1) edge."""
+        halo, width = self.layout.halo, self.layout.width
+        x = self.start if edge == 0 else self.end
+        return max(x - halo, 0), min(x + halo, width)
+
+    def cut(self, edge):
+        a, b = self.edge(edge)
+        return (self.lo, a, [row[a - self.lo:b - self.lo] for row in self.grid])
+
+    def paste(self, message):
+        senderLo, a, columns = message
+        translateColumns(columns, senderLo - self.lo)
+        for row, incoming in zip(self.grid, columns):
+            row[a - self.lo:a - self.lo + len(incoming)] = incoming
+
+    def place(self, x, y, particle):
+        """Write a new particle into an empty cell, like a brush stroke."""
+        if self.grid[y][x - self.lo] is None:
+            particle.translate(-self.lo, 0)
+            self.grid[y][x - self.lo] = particle
+
+    def owned(self):
+        """The owned columns, still region-local, and the lo the receiver must translate them by."""
+        start, end = self.start - self.lo, self.end - self.lo
+        return (self.lo, [row[start:end] for row in self.grid])
+
+    def colors(self, emptyColor):
+        start, end = self.start - self.lo, self.end - self.lo
+        colors = [particle.color if particle is not None else emptyColor
+                  for row in self.grid for particle in row[start:end]]
+        return np.array(colors, dtype=np.uint8).tobytes()
+
+
+def regionWorker(columns, layout, first, last, emptyColor, control, left, right):
+    region = Region(columns, layout, first, last)
+    while True:
+        message = control.recv()
+        if message is None:
+            break
+        if message == "gather":
+            control.send(region.owned())
+            continue
+        frame, animationFrame, placements = message
+        for x, y, particle in placements:
+            region.place(x, y, particle)
+        region.updateChunks(0, frame)
+        if left is not None:
+            left.send(region.cut(0))
+        if right is not None:
+            region.paste(right.recv())
+        region.updateChunks(1, frame)
+        if right is not None:
+            right.send(region.cut(1))
+        if left is not None:
+            region.paste(left.recv())
+        particleShaders.setFrame(animationFrame)
+        control.send_bytes(region.colors(emptyColor))
+
+
+class HaloStepper:
+    """
+    Spreads a plain list-of-lists grid over persistent region workers and steps it.
+    After each step colors[y, x] holds the RGB of every cell of the grid.
+    """
+
+    def __init__(self, grid, layout=None, emptyColor=EMPTY_COLOR):
+        width, height = len(grid[0]), len(grid)
+        self.layout = layout or ChunkLayout(width)
+        self.width, self.height = width, height
+        self.boundsChecks = Particle.checksBounds(grid)
+        self.stepDt = Particle.stepLength(grid)  # the workers' windows keep it, see padding.window
+        self.colors = np.zeros((height, width, 3), dtype=np.uint8)
+        self.colors[:] = emptyColor
+        self.pending = {}  # region index -> [(x, y, particle)] placed before the next step
+        self.frame = 0
+        chunks = self.layout.chunks
+        # One region per worker, the chunk pairs shared out as evenly as they go
+        pairs = (len(chunks) + 1) // 2
+        regionCount = min(self.layout.workers, pairs)
+        bounds = [2 * (pairs * k // regionCount) for k in range(regionCount + 1)]
+        groups = [(first, min(last, len(chunks))) for first, last in zip(bounds, bounds[1:])]
+        self.regions = [(chunks[first][0], chunks[last - 1][1]) for first, last in groups]
+        self.connections, self.processes = [], []
+        links = [Pipe() for _ in range(regionCount - 1)]  # links[k] joins region k and k + 1
+        for k, ((start, end), (first, last)) in enumerate(zip(self.regions, groups)):
+            lo, hi = max(start - self.layout.halo, 0), min(end + self.layout.halo, width)
+            parent, child = Pipe()
+            left = links[k - 1][1] if k > 0 else None
+            right = links[k][0] if k < regionCount - 1 else None
+            process = Process(target=regionWorker, daemon=True,
+                              args=(padding.window(grid, [row[lo:hi] for row in grid], self.layout.halo),
+                                    self.layout, first, last, emptyColor, child, left, right))
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def regionOf(self, x):
+        for k, (start, end) in enumerate(self.regions):
+            if start <= x < end:
+                return k
+        raise IndexError(f"column {x} is outside the grid")
+
+    def place(self, x, y, particle):
+        """Write a particle into the owning worker's grid at the start of the next step, if the cell is still empty."""
+        self.pending.setdefault(self.regionOf(x), []).append((x, y, particle))
+
+    def step(self, frame=None):
+        self.frame = frame if frame is not None else self.frame + 1
+        animationFrame = particleShaders.FRAME
+        for k, conn in enumerate(self.connections):
+            conn.send((self.frame, animationFrame, self.pending.pop(k, [])))
+        for (start, end), conn in zip(self.regions, self.connections):
+            colors = np.frombuffer(conn.recv_bytes(), dtype=np.uint8)
+            self.colors[:, start:end] = colors.reshape(self.height, end - start, 3)
+
+    def gather(self):
+        """Plain grid of every resident particle in global coordinates, a copy of the workers' state."""
+        grid = [[] for _ in range(self.height)]
+        for conn in self.connections:
+            conn.send("gather")
+        for conn in self.connections:
+            lo, owned = conn.recv()
+            translateColumns(owned, lo)
+            for row, columns in zip(grid, owned):
+                row.extend(columns)
+        return padding.like(self, grid, not self.boundsChecks)
+
+    def close(self):
+        for conn in self.connections:
+            conn.send(None)
+        for process in self.processes:
+            process.join()
+        self.connections, self.processes = [], []
@@ -1,57 +1,80 @@
 import pygame
 import math
-from baseParticle import SHADER_CACHE_SPECIFICS  # Assuming this is defined elsewhere
+from particleShaders import advanceFrame
 from stationary import Rock, Wood
 from fire import Fire
 from sand import Gunpowder, Sand
 from fluids import Acid, Water, Oil, Chaos, Void
+import padding
+import engine
+from profiler import PROFILER as prof
+from renderer import GridRenderer
+from timestep import FixedTimestep
+import camera as cameras
 import sharedData
 
 # Constants
-GRID_WIDTH, GRID_HEIGHT = 100, 100
-CELL_SIZE = 6
-WINDOW_WIDTH, WINDOW_HEIGHT = GRID_WIDTH * CELL_SIZE, GRID_HEIGHT * CELL_SIZE
+GRID_WIDTH, GRID_HEIGHT = 300, 300  # the world, the window shows a camera view of it
+CELL_SIZE = 6  # starting zoom, the mouse wheel changes it
+WINDOW_WIDTH, WINDOW_HEIGHT = 600, 600
+OFFSCREEN_POLICY = cameras.REDUCED  # how chunks the camera cannot see are simulated, see camera.py
 EMPTY_COLOR = (0, 0, 0)
 MAX_BRUSH_SIZE = 10
 FPS = 60
+SIM_RATE = 60  # simulation steps per second of real time, independent of FPS
+INTERPOLATE = False  # blend the last two simulated states by how far the next step is along
+PROFILE_PATH = "profile.json"  # where F4 dumps the profiler's samples
 
 grid = None
+pad = 0  # thickness of the wall border around the world in grid, see padding.py
+tracker = None  # activity.ChunkTracker watching grid, None updates every cell
+active = None  # activity.ActiveSet watching grid, None scans cells instead of particles
 brush_size = 1
 screen, clock = None, None
+renderer = None
+camera = None
+previousColors = latestColors = None  # colors of the last two simulated states, for INTERPOLATE
 
 def start_screen():
-    global screen, clock
+    global screen, clock, renderer, camera
     pygame.init()
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
     pygame.display.set_caption("Atlantis Sandbox")
     clock = pygame.time.Clock()
+    camera = cameras.Camera(GRID_WIDTH, GRID_HEIGHT, WINDOW_WIDTH, WINDOW_HEIGHT, CELL_SIZE, OFFSCREEN_POLICY)
+    renderer = GridRenderer(screen, camera.columns, camera.rows, camera.cellSize, EMPTY_COLOR)
 
-def update_shaders():
-    for value_list in SHADER_CACHE_SPECIFICS.values():
-        for item in value_list:
-            item.update()
-
-def draw_grid():
-    screen.fill(EMPTY_COLOR)  # Clear the screen once
-    for y in range(GRID_HEIGHT):
-        for x in range(GRID_WIDTH):
-            if particle := grid[y][x]:
-                rect = pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-                pygame.draw.rect(screen, particle.color, rect)  # Use rect for proper size
-    pygame.display.flip()
+def draw_grid(alpha=1.0, stepped=True):
+    global previousColors, latestColors
+    if (renderer.width, renderer.height, renderer.cellSize) != (camera.columns, camera.rows, camera.cellSize):
+        previousColors = latestColors = None  # zoomed, the old colors no longer line up
+    camera.applyView(renderer)
+    if INTERPOLATE:
+        renderer.fill(grid, pad)
+        if stepped or latestColors is None:
+            previousColors = latestColors if latestColors is not None else renderer.colors.copy()
+            latestColors = renderer.colors.copy()
+        renderer.interpolate(previousColors, alpha)
+        renderer.present()
+    else:
+        renderer.draw(grid, pad)  # one blit of the visible cells, scaled by the zoom
+    if prof.overlay:
+        overlay = prof.drawOverlay(screen)
+        pygame.display.update(overlay)
+        renderer.damage(overlay)  # repaint the cells under it next frame
 
 def add_particle(x, y, particle_type):
     global grid
     if brush_size == 1:
-        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT and grid[y][x] is None:
-            grid[y][x] = create_particle(particle_type, x, y)
+        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT and grid[y + pad][x + pad] is None:
+            grid[y + pad][x + pad] = create_particle(particle_type, x + pad, y + pad)
     else:
         for i in range(-brush_size, brush_size + 1):
             for j in range(-brush_size, brush_size + 1):
                 if math.hypot(i, j) <= brush_size:
                     nx, ny = x + i, y + j
-                    if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT and grid[ny][nx] is None:
-                        grid[ny][nx] = create_particle(particle_type, nx, ny)
+                    if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT and grid[ny + pad][nx + pad] is None:
+                        grid[ny + pad][nx + pad] = create_particle(particle_type, nx + pad, ny + pad)
     sharedData.setGrid(grid)
 
 def create_particle(particle_type, x, y):
@@ -63,11 +86,9 @@ def create_particle(particle_type, x, y):
     return particle_classes.get(particle_type, lambda *_: None)(x, y)
 
 def single_core_update():
-    for y in range(GRID_HEIGHT - 1, -1, -1):
-        row_iter = range(GRID_WIDTH) if y % 2 == 0 else range(GRID_WIDTH - 1, -1, -1)
-        for x in row_iter:
-            if particle := grid[y][x]:
-                particle.update(grid)
+    if tracker is not None:
+        camera.applyPolicy(tracker, grid.frame, pad)
+    engine.stepObjects(grid, pad, GRID_WIDTH, GRID_HEIGHT, tracker, active)
 
 def handle_input(particle_type):
     global brush_size
@@ -88,34 +109,60 @@ def handle_input(particle_type):
                 brush_size = min(MAX_BRUSH_SIZE, brush_size + 1)
             elif event.key == pygame.K_DOWN:
                 brush_size = max(1, brush_size - 1)
+            elif event.key == pygame.K_F3:
+                prof.toggle()
+                prof.overlay = prof.enabled
+            elif event.key == pygame.K_F4:
+                prof.dump(PROFILE_PATH)
+        elif event.type == pygame.MOUSEWHEEL and event.y:
+            camera.zoomAt(1 if event.y > 0 else -1, *pygame.mouse.get_pos())
+        elif event.type == pygame.MOUSEMOTION and event.buttons[2]:
+            camera.pan(*event.rel)  # right drag moves the world with the mouse
     
     if pygame.mouse.get_pressed()[0]:
         mx, my = pygame.mouse.get_pos()
-        add_particle(mx // CELL_SIZE, my // CELL_SIZE, particle_type)
+        add_particle(*camera.screenToWorld(mx, my), particle_type)
     
     return particle_type
 
-def main(multi=False):
+def main(multi=False, uncapped=False):
+    """Uncapped runs one simulation step per frame with no frame cap, for throughput measurement."""
     global grid
-    running, last_time = True, pygame.time.get_ticks()
+    running = True
     particle_type = "sand"
+    timestep = FixedTimestep(SIM_RATE, uncapped=uncapped)
     while running:
-        dt = (pygame.time.get_ticks() - last_time) / 1000.0
-        last_time = pygame.time.get_ticks()
+        prof.beginFrame()
         new_type = handle_input(particle_type)
+        prof.mark("input")
         if new_type is None:
             break
         particle_type = new_type
-        update_shaders()
+        advanceFrame()
+        prof.mark("shaders")
+        steps = timestep.advance()
         if not multi:
-            single_core_update()
+            timestep.apply(grid)  # new_world may have replaced the grid
+            for _ in range(steps):
+                single_core_update()
         else:
             grid = sharedData.getGrid()
-        draw_grid()
-        clock.tick(FPS)   
+        prof.mark("update")
+        draw_grid(timestep.alpha, steps > 0)
+        prof.mark("draw")
+        clock.tick(0 if uncapped else FPS)
+        prof.mark("wait")
+        prof.endFrame()
     pygame.quit()
 
 
+def new_world(chunks=True, sparse=False, thickness=padding.PADDING):
+    global grid, tracker, active, pad
+    pad = thickness
+    grid, tracker, active = engine.newObjectWorld(GRID_WIDTH, GRID_HEIGHT, chunks, sparse, thickness)
+    if renderer is not None:
+        renderer.attach(grid, pad)
+
 def multi_main(newgrid):
     global grid
     grid = newgrid
@@ -124,5 +171,5 @@ def multi_main(newgrid):
 
 if __name__ == "__main__":
     start_screen()
-    grid = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+    new_world()
     main()
\ No newline at end of file
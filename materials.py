@@ -0,0 +1,135 @@
+"""
+Central material registry. Every particle type gets a small integer id and
+a row in the property tables below, so hot code can answer "is this a sand?"
+or "can this displace that?" with a single list lookup instead of comparing
+getType() strings.
+"""
+
+# name, category, flammable, burnChance, density
+# Ids are the row order, which keeps them stable across processes.
+_MATERIAL_ROWS = [
+    ("Empty", None, False, 0, 0),
+    ("Sand", "sand", False, 0, 9),
+    ("Gravel", "sand", False, 0, 9),
+    ("Gunpowder", "sand", True, 0, 9),
+    ("Mulch", "sand", True, 100, 9),
+    ("Water", "fluid", False, 0, 5),
+    ("Acid", "fluid", True, 10, 5),
+    ("Oil", "fluid", True, 2, 4),
+    ("Slime", "fluid", False, 0, 6),
+    ("Chaos", "fluid", False, 0, 5),
+    ("Void", "fluid", False, 0, 5),
+    ("Steam", "gas", False, 0, 1),
+    ("Smoke", "gas", False, 0, 1),
+    ("MysteriousVapor", "gas", False, 0, 1),
+    ("Grassium", "gas", True, 0, 1),
+    ("Rock", "stationary", False, 0, 255),
+    ("Wood", "stationary", True, 25, 255),
+    ("Plant", "stationary", True, 25, 255),
+    ("Fire", "fire", False, 0, 2),
+    ("boid", "boid", True, 0, 255),
+    ("Travelling", "travelling", False, 0, 255),
+    ("Wall", "wall", False, 0, 255),
+]
+
+MATERIALS = []
+MATERIAL_IDS = {}
+CATEGORY = []
+IS_SAND = []
+IS_FLUID = []
+IS_GAS = []
+FLAMMABLE = []
+BURN_CHANCE = []
+DENSITY = []
+CLASSES = []  # particle class registered for each id, None until its module is imported
+
+
+def _addMaterial(name, category, flammable, burnChance, density):
+    materialId = len(MATERIALS)
+    MATERIALS.append(name)
+    MATERIAL_IDS[name] = materialId
+    CATEGORY.append(category)
+    IS_SAND.append(category == "sand")
+    IS_FLUID.append(category == "fluid")
+    IS_GAS.append(category == "gas")
+    FLAMMABLE.append(flammable)
+    BURN_CHANCE.append(burnChance)
+    DENSITY.append(density)
+    CLASSES.append(None)
+    return materialId
+
+
+for _row in _MATERIAL_ROWS:
+    _addMaterial(*_row)
+
+EMPTY = MATERIAL_IDS["Empty"]
+SAND = MATERIAL_IDS["Sand"]
+GRAVEL = MATERIAL_IDS["Gravel"]
+GUNPOWDER = MATERIAL_IDS["Gunpowder"]
+MULCH = MATERIAL_IDS["Mulch"]
+WATER = MATERIAL_IDS["Water"]
+ACID = MATERIAL_IDS["Acid"]
+OIL = MATERIAL_IDS["Oil"]
+SLIME = MATERIAL_IDS["Slime"]
+CHAOS = MATERIAL_IDS["Chaos"]
+VOID = MATERIAL_IDS["Void"]
+STEAM = MATERIAL_IDS["Steam"]
+SMOKE = MATERIAL_IDS["Smoke"]
+MYSTERIOUS_VAPOR = MATERIAL_IDS["MysteriousVapor"]
+GRASSIUM = MATERIAL_IDS["Grassium"]
+ROCK = MATERIAL_IDS["Rock"]
+WOOD = MATERIAL_IDS["Wood"]
+PLANT = MATERIAL_IDS["Plant"]
+FIRE = MATERIAL_IDS["Fire"]
+BOID = MATERIAL_IDS["boid"]
+TRAVELLING = MATERIAL_IDS["Travelling"]
+WALL = MATERIAL_IDS["Wall"]
+
+
+def table(*names):
+    """Membership table indexed by material id, True for the given names."""
+    ids = {MATERIAL_IDS[name] for name in names}
+    return [materialId in ids for materialId in range(len(MATERIALS))]
+
+
+def displaceTable():
+    """DISPLACES[a][b] is True when a particle of a may swap places with b by sinking into it."""
+    movable = [IS_SAND[i] or IS_FLUID[i] or IS_GAS[i] for i in range(len(MATERIALS))]
+    return [[movable[a] and movable[b] and DENSITY[a] > DENSITY[b]
+             for b in range(len(MATERIALS))] for a in range(len(MATERIALS))]
+
+
+# Materials that specific rules look for
+FLUID_SINKS_THROUGH = table("Smoke", "Steam")
+GAS_RISES_THROUGH = table("Sand", "Gunpowder", "Mulch", "Gravel", "Water", "Acid", "Slime", "Oil", "Fire")
+DISPLACES = displaceTable()
+# Horizontal reach of each fluid, the spread argument of its Fluid constructor
+SPREAD = [{"Water": 3, "Acid": 2, "Oil": 2, "Slime": 1, "Chaos": 5, "Void": 3}.get(name, 0) for name in MATERIALS]
+# Particles that never act on their own, everything else is tracked by activity.ActiveSet
+STATIC = table("Rock", "Wood", "Wall")
+DYNAMIC = [materialId != EMPTY and not STATIC[materialId] for materialId in range(len(MATERIALS))]
+# Border cells of a padded grid, nothing may move, replace or destroy them
+INDESTRUCTIBLE = table("Wall")
+# Particles with timers or random behaviour that must keep being updated while nothing around them changes
+RESTLESS = [IS_GAS[i] or flag for i, flag in enumerate(table("Fire", "Slime", "Void", "boid", "Travelling"))]
+
+
+def registerClass(cls):
+    """Bind a particle class to the id of its type, called from Particle.__init_subclass__."""
+    materialId = MATERIAL_IDS[cls.type]  # new types need a row in _MATERIAL_ROWS
+    CLASSES[materialId] = cls
+    return materialId
+
+
+def classesWhere(flags):
+    """Registered particle classes whose id is set in the given table."""
+    return [cls for materialId, cls in enumerate(CLASSES) if cls is not None and flags[materialId]]
+
+
+def classFor(name):
+    return CLASSES[MATERIAL_IDS[name]]
+
+
+def loadAll():
+    """Import every particle module so CLASSES is fully populated."""
+    import sand, fluids, gases, stationary, fire, boids, travel
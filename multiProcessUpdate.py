@@ -5,120 +5,297 @@ from stationary import Rock, Wood
 from fire import Fire
 from sand import Gunpowder, Sand
 from fluids import Acid, Water, Oil, Chaos, Void
+from explosions import resolveExplosions
+from materials import RESTLESS
+import tracing
+import pickle
+import os
+import math
+import padding
 from multiprocessing import Process, Manager
 
 GRID_WIDTH, GRID_HEIGHT = 100, 100
 CHUNK_SIZE = 10
+TILE_SIZE = 20
+
+
+class ChunkLayout:
+    """
+    Column chunks of a grid width columns wide and the two phases they are updated in.
+
+    Chunk i owns columns [start, end) and is updated together with halo columns
+    on either side, so every neighbour probe of an owned cell stays inside its
+    window. Chunks of one phase are two apart, and chunkWidth >= 2 * halo keeps
+    their windows from overlapping. The last chunk is narrower when chunkWidth
+    does not divide the width.
+    """
+
+    def __init__(self, width, chunkWidth=None, halo=padding.PADDING, workers=None):
+        workers = workers or os.cpu_count() or 1
+        if chunkWidth is None:
+            # About one chunk per worker in each phase, never below the halo limit
+            chunkWidth = max(2 * halo, math.ceil(width / (2 * workers)))
+        if chunkWidth < 2 * halo:
+            raise ValueError(f"chunks of {chunkWidth} columns are too narrow for a {halo} column halo")
+        self.width, self.chunkWidth, self.halo = width, chunkWidth, halo
+        self.chunks = [(start, min(start + chunkWidth, width)) for start in range(0, width, chunkWidth)]
+        self.phases = (list(range(0, len(self.chunks), 2)), list(range(1, len(self.chunks), 2)))
+        self.workers = max(1, min(workers, len(self.phases[0])))  # more would sit idle
+
+    def window(self, index):
+        """Columns [lo, hi) a chunk reads and writes, its halo included."""
+        start, end = self.chunks[index]
+        return max(start - self.halo, 0), min(end + self.halo, self.width)
+
+    def task(self, grid, index, frame):
+        return (grid, index, frame, self)
+
+    def update(self, task):
+        return extract_grid_section_and_update(task)
+
+    def reassemble(self, grid, sections, indices, tracker=None):
+        return reassembleGrid(grid, sections, indices, self)
+
+    def isAwake(self, index, tracker):
+        return True
+
+
+class TileLayout:
+    """
+    Rectangular tiles of a width x height grid and the four phases of a 2x2 checkerboard.
+
+    Tile (tx, ty) runs in phase (ty % 2) * 2 + tx % 2, so tiles of one phase are
+    two apart on both axes and, with tiles at least 2 * halo on a side, their
+    halo windows never overlap. Tiles on the right and bottom edges are smaller
+    when the tile size does not divide the grid.
+    """
+
+    def __init__(self, width, height, tileWidth=TILE_SIZE, tileHeight=None, halo=padding.PADDING, workers=None):
+        tileHeight = tileHeight or tileWidth
+        if min(tileWidth, tileHeight) < 2 * halo:
+            raise ValueError(f"{tileWidth}x{tileHeight} tiles are too small for a {halo} cell halo")
+        self.width, self.height, self.halo = width, height, halo
+        self.tileWidth, self.tileHeight = tileWidth, tileHeight
+        self.tiles = []  # (x0, y0, x1, y1) owned cells, exclusive ends
+        phases = ([], [], [], [])
+        for ty, y0 in enumerate(range(0, height, tileHeight)):
+            for tx, x0 in enumerate(range(0, width, tileWidth)):
+                phases[(ty % 2) * 2 + tx % 2].append(len(self.tiles))
+                self.tiles.append((x0, y0, min(x0 + tileWidth, width), min(y0 + tileHeight, height)))
+        self.phases = tuple(phase for phase in phases if phase)
+        workers = workers or os.cpu_count() or 1
+        self.workers = max(1, min(workers, max(len(phase) for phase in self.phases)))
+
+    def window(self, index):
+        """Cells (xlo, ylo, xhi, yhi) a tile reads and writes, its halo included."""
+        x0, y0, x1, y1 = self.tiles[index]
+        halo = self.halo
+        return max(x0 - halo, 0), max(y0 - halo, 0), min(x1 + halo, self.width), min(y1 + halo, self.height)
+
+    def task(self, grid, index, frame):
+        # Tiles only ship their window, not the whole grid
+        xlo, ylo, xhi, yhi = self.window(index)
+        return (padding.window(grid, [row[xlo:xhi] for row in grid[ylo:yhi]], self.halo), index, frame, self)
+
+    def update(self, task):
+        return update_tile(task)
+
+    def reassemble(self, grid, sections, indices, tracker=None):
+        return reassembleTiles(grid, sections, indices, self, tracker)
+
+    def isAwake(self, index, tracker):
+        """Whether any tracker chunk under the tile is awake, always true without a tracker."""
+        if tracker is None:
+            return True
+        x0, y0, x1, y1 = self.tiles[index]
+        size = tracker.chunkSize
+        return any(tracker.isAwake(cx, cy)
+                   for cy in range(y0 // size, (y1 - 1) // size + 1)
+                   for cx in range(x0 // size, (x1 - 1) // size + 1))
 
 
 def extract_grid_section_and_update(args) -> list[list]:
-    newGrid, index = args
-    if index == 0:
-        start_col, end_col = 0, 14
-    elif index == 9:
-        start_col, end_col = 85, 99
-    else:
-        center = (index * 10) + 5
-        start_col = center - 10
-        end_col = center + 9
-
-    subgrid = [row[start_col:end_col + 1] for row in newGrid]
-    num_cols = end_col - start_col + 1
-
-    if num_cols == 20:
-        update_start, update_end = 5, 14
-    elif num_cols == 15 and index == 0:
-        update_start, update_end = 0, 9
-    elif num_cols == 15 and index == 9:
-        update_start, update_end = 5, 14
-    else:
-        update_start, update_end = 0, 0
-
-    for y in range(GRID_HEIGHT - 1, -1, -1):
-        if y >= len(subgrid):
-            continue
-        for x in range(update_start, update_end + 1):
-            if x >= len(subgrid[y]):
-                continue
-            cell = subgrid[y][x]
+    newGrid, index, frame, layout = args
+    lo, hi = layout.window(index)
+    start, end = layout.chunks[index]
+    subgrid = padding.window(newGrid, [row[lo:hi] for row in newGrid], layout.halo)
+    # Particles address the subgrid while they update, so every x in the window goes local
+    for row in subgrid:
+        for x, cell in enumerate(row):
             if cell is not None:
-                positionX = (index * 10) + x
-                cell.setCoordsForLocal(positionX, index)
+                cell.setCoordsForLocal(lo + x, lo)
+
+    for y in range(len(subgrid) - 1, -1, -1):
+        row = subgrid[y]
+        for x in range(start - lo, end - lo):
+            cell = row[x]
+            if cell is not None and cell.lastTick != frame:
+                cell.lastTick = frame
                 cell.update(subgrid)
+    resolveExplosions()
+    for row in subgrid:
+        for cell in row:
+            if cell is not None:
+                cell.convertToGlobal(lo)
     return subgrid
 
 
-def reassembleGrid(originalGrid, ListOfChunks, odd=False):
-    oddOffsets = [5, 25, 45, 65, 85]
-    evenOffsets = [0, 15, 35, 55, 75]
-    offsets = oddOffsets if odd else evenOffsets
-    for n in range(len(ListOfChunks)):
-        chunk = ListOfChunks[n]
-        start_col = offsets[n]
-        chunk_width = len(chunk[0])
-        end_col = start_col + chunk_width
-        for row_idx in range(len(chunk)):
-            for col_offset in range(chunk_width):
-                originalGrid[row_idx][start_col + col_offset] = chunk[row_idx][col_offset]
+def reassembleGrid(originalGrid, ListOfChunks, indices, layout):
+    """Write each updated window back over the columns it was cut from."""
+    for index, chunk in zip(indices, ListOfChunks):
+        lo = layout.window(index)[0]
+        for row_idx, row in enumerate(chunk):
+            originalGrid[row_idx][lo:lo + len(row)] = row
+    return originalGrid
+
+
+def update_tile(args) -> list[list]:
+    """Update the cells a tile owns inside its window, bottom to top with alternating row directions."""
+    section, index, frame, layout = args
+    xlo, ylo, _, _ = layout.window(index)
+    x0, y0, x1, y1 = layout.tiles[index]
+    for row in section:
+        for cell in row:
+            if cell is not None:
+                cell.translate(-xlo, -ylo)
+
+    for y in range(y1 - 1, y0 - 1, -1):
+        row = section[y - ylo]
+        columns = range(x0 - xlo, x1 - xlo) if y % 2 == 0 else range(x1 - xlo - 1, x0 - xlo - 1, -1)
+        for x in columns:
+            cell = row[x]
+            if cell is not None and cell.lastTick != frame:
+                cell.lastTick = frame
+                cell.update(section)
+    resolveExplosions()
+    for row in section:
+        for cell in row:
+            if cell is not None:
+                cell.translate(xlo, ylo)
+    return section
+
+
+def reassembleTiles(originalGrid, sections, indices, layout, tracker=None):
+    """Write each updated tile window back, waking the tracker where a cell changed material."""
+    for index, section in zip(indices, sections):
+        xlo, ylo, _, _ = layout.window(index)
+        for y, row in enumerate(section, ylo):
+            target = originalGrid[y]
+            if tracker is not None:
+                for x, new in enumerate(row, xlo):
+                    old = target[x]
+                    if type(old) is not type(new):
+                        tracker.cellChanged(x, y, old, new)
+                    elif new is not None and RESTLESS[new.materialId]:
+                        tracker.keepAwake(x, y)
+            target[xlo:xlo + len(row)] = row
     return originalGrid
 
 
-def multi_collect(grid, indices, pool):
-    args = [(grid, i + 1) for i in indices]
-    return pool.map(extract_grid_section_and_update, args)
+def multi_collect(grid, indices, pool, frame, layout):
+    args = [layout.task(grid, i, frame) for i in indices]
+    return pool.map(layout.update, args)
 
 def worker_loop(task_queue: Queue, result_queue: Queue):
+    tracing.nameProcess(f"worker {os.getpid()}")
     while True:
-        task = task_queue.get()
+        with tracing.span("wait for task"):
+            task = task_queue.get()
         if task == "STOP":
+            if tracing.ENABLED:
+                result_queue.put(("STOP", tracing.take()))  # the events since the last result, final wait included
             break
-        newGrid, index = task
-        updated_chunk = extract_grid_section_and_update((newGrid, index))
-        result_queue.put((index, updated_chunk))
+        if tracing.ENABLED:
+            # Traced tasks arrive pre-pickled so (un)pickling shows up as its own span
+            with tracing.span("unpickle task"):
+                task = pickle.loads(task)
+        _, index, frame, layout = task
+        with tracing.span("update chunk", index=index, frame=frame):
+            updated_chunk = layout.update(task)
+        if tracing.ENABLED:
+            with tracing.span("pickle result", index=index):
+                payload = pickle.dumps((index, updated_chunk))
+            result_queue.put((payload, tracing.take()))
+        else:
+            result_queue.put((index, updated_chunk))
+
+def stop_workers(workers, task_queue, result_queue):
+    """Stop worker_loop processes, merging the trace events they flush on the way out."""
+    for _ in workers:
+        task_queue.put("STOP")
+    stopped = 0
+    while tracing.ENABLED and stopped < len(workers):
+        tag, events = result_queue.get()  # results of an interrupted frame may still be queued
+        tracing.merge(events)
+        stopped += tag == "STOP"
+    for p in workers:
+        p.join()
+
+
+def traced_update(task):
+    """layout.update for a process pool, returning the worker's trace events with the section."""
+    _, index, frame, layout = task
+    tracing.nameProcess(f"worker {os.getpid()}")
+    with tracing.span("update chunk", index=index, frame=frame):
+        section = layout.update(task)
+    return section, tracing.take()
+
 
-def collect_updates(newGrid, indices, task_queue, result_queue):
+def collect_updates(newGrid, indices, task_queue, result_queue, frame, layout):
     for i in indices:
-        task_queue.put((newGrid, i))
+        task = layout.task(newGrid, i, frame)
+        if tracing.ENABLED:
+            with tracing.span("pickle task", index=i):
+                task = pickle.dumps(task)
+        with tracing.span("put task", index=i):
+            task_queue.put(task)
     results = {}
     for _ in indices:
-        index, chunk = result_queue.get()
+        with tracing.span("wait for result"):
+            result = result_queue.get()
+        if tracing.ENABLED:
+            payload, events = result
+            tracing.merge(events)
+            with tracing.span("unpickle result"):
+                result = pickle.loads(payload)
+        index, chunk = result
         results[index] = chunk
     return [results[i] for i in sorted(indices)]
 
 
-def updateGrid(grid, test = False):
+def updateGrid(grid, test = False, frames = None, layout = None):
+    """Run the worker loop, forever unless frames is given. With tracing on, the trace is written when it stops."""
     freeze_support()
+    layout = layout or ChunkLayout(len(grid[0]))
+    if test:
+        with multiprocessing.Pool(processes=layout.workers) as pool: #run one iteration and return the grid to check that it's correct
+            for indices in layout.phases:
+                subgrids = multi_collect(grid, indices, pool, 1, layout)
+                grid = layout.reassemble(grid, subgrids, indices)
+            print("Subgrids updated and grid reassembled")
+            return grid
     task_queue = Queue()
     result_queue = Queue()
-    # Spawn 10 persistent worker processes
+    # One persistent worker per chunk or tile of a phase, up to the cpu count
     workers = []
-    for _ in range(10):
+    for _ in range(layout.workers):
         p = Process(target=worker_loop, args=(task_queue, result_queue))
         p.start()
         workers.append(p)
-    if test:
-        with multiprocessing.Pool(processes=10) as pool: #run one iteration and return the grid to check that it's correct
-            even_indices = [0, 2, 4, 6, 8]
-            even_subgrids = multi_collect(grid, even_indices, pool)
-            grid = reassembleGrid(grid, even_subgrids)
-            print("Even subgrids updated and grid reassembled")
-
-            odd_indices = [1, 3, 5, 7, 9]
-            odd_subgrids = multi_collect(grid, odd_indices, pool)
-            grid = reassembleGrid(grid, odd_subgrids, True)
-            print("Odd subgrids updated and grid reassembled")
-            return grid
-    with multiprocessing.Pool(processes=10) as pool:
-        while True:
-            even_indices = [0, 2, 4, 6, 8]
-            even_subgrids = collect_updates(grid, even_indices, task_queue, result_queue)
-            grid = reassembleGrid(grid, even_subgrids)
-
-            # Odd indices
-            odd_indices = [1, 3, 5, 7, 9]
-            odd_subgrids = collect_updates(grid, odd_indices, task_queue, result_queue)
-            grid = reassembleGrid(grid, odd_subgrids, True)
-                #print("Odd subgrids updated and grid reassembled")
+    tracing.nameProcess("main")
+    frame = 0
+    try:
+        while frames is None or frame < frames:
+            frame += 1
+            for indices in layout.phases:
+                subgrids = collect_updates(grid, indices, task_queue, result_queue, frame, layout)
+                with tracing.span("reassemble"):
+                    grid = layout.reassemble(grid, subgrids, indices)
+    finally:
+        stop_workers(workers, task_queue, result_queue)
+        if tracing.ENABLED:
+            print("Trace written to", tracing.write())
+    return grid
 
 def create_particle(particle_type, x, y):
     particle_classes = {
@@ -135,4 +312,4 @@ if __name__ == "__main__":
     for y in range(GRID_WIDTH):
         for x in range(GRID_HEIGHT):
             grid[y][x] = create_particle("sand", x, y)
-    updateGrid(grid)
+    updateGrid(grid, layout=ChunkLayout(GRID_WIDTH, CHUNK_SIZE))
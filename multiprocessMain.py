@@ -1,12 +1,18 @@
 import multiprocessing
 from multiprocessing import freeze_support, Process, Queue
-from baseParticle import SHADER_CACHE_SPECIFICS
+from particleShaders import advanceFrame
 from stationary import Rock, Wood
 from fire import Fire
 from sand import Gunpowder, Sand
 from fluids import Acid, Water, Oil, Chaos, Void
+from multiProcessUpdate import ChunkLayout, TileLayout, collect_updates, worker_loop, stop_workers
+from activity import ChunkTracker
+from haloExchange import HaloStepper
+import tracing
 import math
 import pygame
+from renderer import GridRenderer
+from profiler import PROFILER as prof
 
 # Constants
 GRID_WIDTH, GRID_HEIGHT = 100, 100
@@ -15,44 +21,56 @@ WINDOW_WIDTH, WINDOW_HEIGHT = GRID_WIDTH * CELL_SIZE, GRID_HEIGHT * CELL_SIZE
 EMPTY_COLOR = (0, 0, 0)
 MAX_BRUSH_SIZE = 10
 FPS = 60
+PROFILE_PATH = "profile.json"  # where F4 dumps the profiler's samples
+CHUNK_WIDTH = 10  # columns per chunk, None sizes chunks from the worker count
+WORKERS = None  # worker processes, None uses os.cpu_count()
+TILE_SIZE = None  # edge of the 2D checkerboard tiles, None keeps column chunks
+HALO_EXCHANGE = False  # keep chunks resident in workers that only trade halo columns, see haloExchange.py
 
 grid = None
+tracker = None  # wakes tiles when TILE_SIZE is set
+stepper = None  # owns the particles when HALO_EXCHANGE is set
 brush_size = 1
 screen, clock = None, None
+renderer = None
 
 def start_screen():
-    global screen, clock
+    global screen, clock, renderer
     pygame.init()
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
     pygame.display.set_caption("Atlantis Sandbox")
     clock = pygame.time.Clock()
-
-def update_shaders():
-    for value_list in SHADER_CACHE_SPECIFICS.values():
-        for item in value_list:
-            item.update()
+    renderer = GridRenderer(screen, GRID_WIDTH, GRID_HEIGHT, CELL_SIZE, EMPTY_COLOR)
 
 def draw_grid():
-    screen.fill(EMPTY_COLOR)
-    for y in range(GRID_HEIGHT):
-        for x in range(GRID_WIDTH):
-            if particle := grid[y][x]:
-                rect = pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-                pygame.draw.rect(screen, particle.color, rect)
-    pygame.display.flip()
+    if stepper is not None:
+        renderer.fillFromColors(stepper.colors)
+        renderer.present()
+    else:
+        renderer.draw(grid)
+    if prof.overlay:
+        overlay = prof.drawOverlay(screen)
+        pygame.display.update(overlay)
+        renderer.damage(overlay)
+
+def put_particle(x, y, particle_type):
+    if not (0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT):
+        return
+    if stepper is not None:
+        stepper.place(x, y, create_particle(particle_type, x, y))  # the owning worker skips filled cells
+    elif grid[y][x] is None:
+        grid[y][x] = create_particle(particle_type, x, y)
+        if tracker is not None:
+            tracker.cellChanged(x, y, None, grid[y][x])
 
 def add_particle(x, y, particle_type):
-    global grid
     if brush_size == 1:
-        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT and grid[y][x] is None:
-            grid[y][x] = create_particle(particle_type, x, y)
+        put_particle(x, y, particle_type)
     else:
         for i in range(-brush_size, brush_size + 1):
             for j in range(-brush_size, brush_size + 1):
                 if math.hypot(i, j) <= brush_size:
-                    nx, ny = x + i, y + j
-                    if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT and grid[ny][nx] is None:
-                        grid[ny][nx] = create_particle(particle_type, nx, ny)
+                    put_particle(x + i, y + j, particle_type)
 
 def create_particle(particle_type, x, y):
     particle_classes = {
@@ -80,125 +98,79 @@ def handle_input(particle_type):
                 brush_size = min(MAX_BRUSH_SIZE, brush_size + 1)
             elif event.key == pygame.K_DOWN:
                 brush_size = max(1, brush_size - 1)
+            elif event.key == pygame.K_F3:
+                prof.toggle()
+                prof.overlay = prof.enabled
+            elif event.key == pygame.K_F4:
+                prof.dump(PROFILE_PATH)
     if pygame.mouse.get_pressed()[0]:
         mx, my = pygame.mouse.get_pos()
         add_particle(mx // CELL_SIZE, my // CELL_SIZE, particle_type)
     return particle_type
 
-def extract_grid_section_and_update(args) -> list[list]:
-    newGrid, index = args
-    if index == 0:
-        start_col, end_col = 0, 14
-    elif index == 9:
-        start_col, end_col = 85, 99
-    else:
-        center = (index * 10) + 5
-        start_col = center - 10
-        end_col = center + 9
-
-    subgrid = [row[start_col:end_col + 1] for row in newGrid]
-    num_cols = end_col - start_col + 1
-
-    if num_cols == 20:
-        update_start, update_end = 5, 14
-    elif num_cols == 15 and index == 0:
-        update_start, update_end = 0, 9
-    elif num_cols == 15 and index == 9:
-        update_start, update_end = 5, 14
-    else:
-        update_start, update_end = 0, 0
-
-    for y in range(GRID_HEIGHT - 1, -1, -1):
-        if y >= len(subgrid):
-            continue
-        for x in range(update_start, update_end + 1):
-            if x >= len(subgrid[y]):
-                continue
-            cell = subgrid[y][x]
-            if cell is not None:
-                positionX = (index * 10) + x
-                cell.setCoordsForLocal(positionX, index)
-                cell.update(subgrid)
-    return subgrid
-
-def reassembleGrid(originalGrid, ListOfChunks, odd=False):
-    oddOffsets = [5, 25, 45, 65, 85]
-    evenOffsets = [0, 15, 35, 55, 75]
-    offsets = oddOffsets if odd else evenOffsets
-    for n in range(len(ListOfChunks)):
-        chunk = ListOfChunks[n]
-        start_col = offsets[n]
-        chunk_width = len(chunk[0])
-        end_col = start_col + chunk_width
-        for row_idx in range(len(chunk)):
-            for col_offset in range(chunk_width):
-                originalGrid[row_idx][start_col + col_offset] = chunk[row_idx][col_offset]
-    return originalGrid
-
-# --- Multiprocessing Worker and Controller ---
-
-def worker_loop(task_queue: Queue, result_queue: Queue):
-    while True:
-        task = task_queue.get()
-        if task == "STOP":
-            break
-        newGrid, index = task
-        updated_chunk = extract_grid_section_and_update((newGrid, index))
-        result_queue.put((index, updated_chunk))
-
-def collect_updates(newGrid, indices, task_queue, result_queue):
-    for i in indices:
-        task_queue.put((newGrid, i))
-    results = {}
-    for _ in indices:
-        index, chunk = result_queue.get()
-        results[index] = chunk
-    return [results[i] for i in sorted(indices)]
-
 # --- Main Update Loop ---
 
 def updateGrid():
-    global grid
+    global grid, tracker, stepper
     freeze_support()
     running = True
     particle_type = "sand"
     # Queues for worker communication
     task_queue = Queue()
     result_queue = Queue()
-    odd = True
-    # Spawn 10 persistent worker processes
+    if TILE_SIZE and not HALO_EXCHANGE:  # halo regions are built from column chunks
+        layout = TileLayout(GRID_WIDTH, GRID_HEIGHT, TILE_SIZE, workers=WORKERS)
+        tracker = ChunkTracker(GRID_WIDTH, GRID_HEIGHT)
+    else:
+        layout = ChunkLayout(GRID_WIDTH, CHUNK_WIDTH, workers=WORKERS)
+    phase = 0
+    frame = 0
     workers = []
-    for _ in range(10):
+    if HALO_EXCHANGE:
+        stepper = HaloStepper(grid, layout, EMPTY_COLOR)
+    for _ in range(layout.workers if stepper is None else 0):
         p = Process(target=worker_loop, args=(task_queue, result_queue))
         p.start()
         workers.append(p)
     print("Starting game loop...")
+    tracing.nameProcess("main")
     while running:
+        prof.beginFrame()
         new_type = handle_input(particle_type)
+        prof.mark("input")
         if new_type is None:
             running = False
             break
         particle_type = new_type
-        update_shaders()
-        if odd:
-        # Even indices
-            even_indices = [0, 2, 4, 6, 8]
-            even_subgrids = collect_updates(grid, even_indices, task_queue, result_queue)
-            grid = reassembleGrid(grid, even_subgrids)
+        advanceFrame()
+        prof.mark("shaders")
+        frame += 1
+        if stepper is not None:
+            stepper.step(frame)  # both phases, the workers trade halos between them
+            prof.mark("update")
         else:
-        # Odd indices
-            odd_indices = [1, 3, 5, 7, 9]
-            odd_subgrids = collect_updates(grid, odd_indices, task_queue, result_queue)
-            grid = reassembleGrid(grid, odd_subgrids, True)
-        odd = not odd
+            # One phase a frame, cycling through the layout's phases
+            if phase == 0 and tracker is not None:
+                tracker.beginFrame()
+            indices = [i for i in layout.phases[phase] if layout.isAwake(i, tracker)]
+            subgrids = collect_updates(grid, indices, task_queue, result_queue, frame, layout)
+            prof.mark("update")
+            with tracing.span("reassemble"):
+                grid = layout.reassemble(grid, subgrids, indices, tracker)
+            prof.mark("reassemble")
+            phase = (phase + 1) % len(layout.phases)
         draw_grid()
+        prof.mark("draw")
         clock.tick(FPS)
+        prof.mark("wait")
+        prof.endFrame()
 
     # Graceful shutdown
-    for _ in workers:
-        task_queue.put("STOP")
-    for p in workers:
-        p.join()
+    stop_workers(workers, task_queue, result_queue)
+    if stepper is not None:
+        stepper.close()
+    if tracing.ENABLED:
+        print("Trace written to", tracing.write())
 
     print("Game loop ended.")
 
@@ -0,0 +1,72 @@
+"""
+Padded grid layout. The world is surrounded by a border of immovable Wall
+cells, thick enough that no neighbour probe from inside the world can reach
+past it, so particles can skip their bounds tests. The choice belongs to each
+grid, particles read it with Particle.checksBounds(grid), so a padded world and
+an unpadded one can run side by side. Rows cut from a grid for a worker keep the
+choice and the grid's step length with them. Particle coordinates are in padded
+space, the world's (0, 0) is (thickness, thickness).
+"""
+from activity import TrackedGrid
+from baseParticle import Particle, STEP_DT
+from stationary import Wall
+
+# Deepest neighbour probe in the particle code: Fluid.disperse with Chaos's spread of 5.
+# Boids look 4 cells around them, explosions clip their own stencil.
+PADDING = 5
+
+
+class GridRows(list):
+    """Plain list of rows carrying the settings of the grid it was cut from, picklable for the process pool backends."""
+    boundsChecks = True
+    stepDt = STEP_DT
+
+
+class PaddedRows(GridRows):
+    """GridRows with a wall border of at least PADDING."""
+    boundsChecks = False
+
+
+def fillBorder(grid, thickness):
+    height, width = len(grid), len(grid[0])
+    for y in range(height):
+        for x in range(width):
+            if x < thickness or y < thickness or x >= width - thickness or y >= height - thickness:
+                grid[y][x] = Wall(x, y)
+
+
+def newPaddedGrid(width, height, thickness=PADDING):
+    """Empty TrackedGrid for a width x height world plus its wall border."""
+    grid = TrackedGrid(width + 2 * thickness, height + 2 * thickness)
+    fillBorder(grid, thickness)
+    grid.boundsChecks = thickness < PADDING
+    return grid
+
+
+def padGrid(grid, thickness=PADDING):
+    """Plain list-of-lists copy of an unpadded grid with a wall border, particles are shifted to match."""
+    width, height = len(grid[0]), len(grid)
+    padded = [[None] * (width + 2 * thickness) for _ in range(height + 2 * thickness)]
+    padded = PaddedRows(padded) if thickness >= PADDING else GridRows(padded)
+    fillBorder(padded, thickness)
+    for y, row in enumerate(grid):
+        for x, particle in enumerate(row):
+            if particle is not None:
+                particle.x, particle.y = x + thickness, y + thickness
+                padded[y + thickness][x + thickness] = particle
+    return padded
+
+
+def window(grid, rows, halo):
+    """
+    rows cut from grid around the cells that update, with halo cells on every side
+    that has no wall. They skip bounds tests when grid does and the halo is deep enough.
+    """
+    return like(grid, rows, not Particle.checksBounds(grid) and halo >= PADDING)
+
+
+def like(grid, rows, padded):
+    """rows as GridRows, or PaddedRows when padded, stepping with grid's step length."""
+    rows = PaddedRows(rows) if padded else GridRows(rows)
+    rows.stepDt = Particle.stepLength(grid)
+    return rows
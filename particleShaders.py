@@ -1,32 +1,91 @@
+import math
 import random
 
+# Shaders are compiled into palettes: the whole color cycle of a shader variant is
+# precomputed once, and every particle using it reads its color from the shared
+# animation clock, so animating costs nothing per particle.
+FRAME = 0  # animation clock, advanced once per rendered frame by advanceFrame
+SHADERS = {}  # material id -> compiled variants of that material's shader
+RANDOM_SEQUENCE = 32  # colors picked in advance for a Randomize palette
+FLOCK_SEQUENCE = 8  # colors picked in advance for a Flock palette
+
+
+def advanceFrame():
+    global FRAME
+    FRAME += 1
+
+
+def setFrame(frame):
+    """Match another process's animation clock, for workers that resolve colors themselves."""
+    global FRAME
+    FRAME = frame
+
+
+def compileShaders(materialId, name, colors, shader_class, shader_args=(), variants=1):
+    """
+    Variants of a material's shader, compiled on first use. They are seeded by name so
+    every process compiles identical palettes and a variant index means the same colors.
+    """
+    shaders = SHADERS.get(materialId)
+    if shaders is None:
+        rng = random.Random(name)
+        shaders = []
+        for variant in range(variants):
+            shader = shader_class(colors, *shader_args, rng=rng)
+            shader.spec = (materialId, name, colors, shader_class, tuple(shader_args), variants, variant)
+            shaders.append(shader)
+        SHADERS[materialId] = shaders
+    return shaders
+
+
+def loadShader(materialId, name, colors, shader_class, shader_args, variants, variant):
+    return compileShaders(materialId, name, colors, shader_class, shader_args, variants)[variant]
+
+
 class ParticleShader:
 
-    def __init__(self, colors):
+    def __init__(self, colors, rng=random):
         self.colorRange = colors
-        self.currentColor = self.pickColorInRange()
+        self.spec = None
+        self.palette = self.compilePalette(rng)
+        self.phase = rng.randrange(len(self.palette))  # variants start at different points of the cycle
 
-    def update(self):
-        pass
+    def __reduce__(self):
+        # Pickled as its compile arguments so particles sent to worker processes stay small
+        return (loadShader, self.spec)
+
+    def compilePalette(self, rng):
+        return [self.pickColorInRange(rng)]
 
-    def pickColorInRange(self): #returns a tuple of RGB values from the preset colors
+    def pickColorInRange(self, rng=random): #returns a tuple of RGB values from the preset colors
         color1 = self.colorRange[0]
         color2 = self.colorRange[1]
-        r = random.randint(min(color1[0], color2[0]), max(color1[0], color2[0]))
-        g = random.randint(min(color1[1], color2[1]), max(color1[1], color2[1]))
-        b = random.randint(min(color1[2], color2[2]), max(color1[2], color2[2]))
+        r = rng.randint(min(color1[0], color2[0]), max(color1[0], color2[0]))
+        g = rng.randint(min(color1[1], color2[1]), max(color1[1], color2[1]))
+        b = rng.randint(min(color1[2], color2[2]), max(color1[2], color2[2]))
         return (r, g, b)
-    
-        
+
+
     def fetchColor(self):
-        return self.currentColor
+        return self.palette[(FRAME + self.phase) % len(self.palette)]
 
 class Shimmer(ParticleShader):
 
-    def __init__(self, colors, speed):
-        super().__init__(colors)
+    def __init__(self, colors, speed, rng=random):
         self.speed = speed
         self.direction = 1  # 1 for forward (towards color2), -1 for backward (towards color1)
+        super().__init__(colors, rng)
+
+    def compilePalette(self, rng):
+        """One ping-pong from color1 to color2 and back."""
+        self.currentColor, self.direction = self.colorRange[0], 1
+        palette = [self.currentColor]
+        for _ in range(4 * math.ceil(1 / self.speed) + 4):  # bounded in case the ends are never hit exactly
+            self.calculate_next_color(self.speed)
+            if self.direction == 1 and self.currentColor == self.colorRange[0]:
+                break
+            palette.append(self.currentColor)
+        return palette
 
     def calculate_next_color(self, speed):
         """
@@ -56,39 +115,35 @@ class Shimmer(ParticleShader):
 
         return self.currentColor
 
-    def update(self):
-        self.calculate_next_color(self.speed)
-
 class Randomize(ParticleShader):
 
-    def __init__(self, colors, speed):
-        super().__init__(colors) 
-        self.speed = speed 
-        self.timeElapsed = 0
-        
-    def update(self):
-        self.timeElapsed += 1
-        if self.timeElapsed / self.speed == 1:
-            self.timeElapsed = 0
-            self.currentColor = self.pickColorInRange()
-        
+    def __init__(self, colors, speed, rng=random):
+        self.speed = speed
+        super().__init__(colors, rng)
+
+    def compilePalette(self, rng):
+        # A new random color every speed frames
+        palette = []
+        for _ in range(RANDOM_SEQUENCE):
+            palette.extend([self.pickColorInRange(rng)] * self.speed)
+        return palette
+
 class Still(ParticleShader):
 
-    def __init__(self, colors):
-        super().__init__(colors)  
+    def __init__(self, colors, rng=random):
+        super().__init__(colors, rng)
         pass
 
 class Flock(ParticleShader):
 
-    def __init__(self, colors):
-        super().__init__(colors)
-        self.frameCount = 0
+    def __init__(self, colors, rng=random):
         self.resetThreshold = 400
+        super().__init__(colors, rng)
         pass
 
-    def update(self):
-        if self.frameCount == self.resetThreshold:
-            self.currentColor = self.pickColorInRange()
-            self.frameCount = 0
-        self.frameCount += 1
-        
\ No newline at end of file
+    def compilePalette(self, rng):
+        # Picks a new color every resetThreshold frames
+        palette = []
+        for _ in range(FLOCK_SEQUENCE):
+            palette.extend([self.pickColorInRange(rng)] * self.resetThreshold)
+        return palette
@@ -0,0 +1,167 @@
+"""
+Optional frame profiler. Records how long each phase of a frame takes (input,
+shaders, update, draw, wait) and, while enabled, the time and call count of
+every particle class's update. When disabled every hook is a single flag test
+and the particle classes are left untouched.
+
+    prof = PROFILER
+    prof.beginFrame()
+    handle_input(); prof.mark("input")
+    ...
+    prof.endFrame()
+
+Particle updates that run in worker processes are not seen by the per-class counters.
+"""
+import json
+import time
+from collections import deque
+from materials import CLASSES, loadAll
+
+WINDOW = 600  # frames kept for the overlay and for dump()
+OVERLAY_FRAMES = 60  # frames averaged by the overlay
+
+
+class FrameProfiler:
+    def __init__(self, window=WINDOW):
+        self.enabled = False
+        self.overlay = False
+        self.samples = deque(maxlen=window)  # one {"frame", "total", phase: seconds} dict per frame
+        self.classStats = {}  # particle type -> [seconds, calls]
+        self.frame = 0
+        self.classFrames = 0  # frames covered by classStats
+        self.current = None
+        self.last = 0.0
+        self.patched = {}  # class -> update it had in its own __dict__, None when it was inherited
+        self.font = None
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            self.instrumentClasses()
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            self.restoreClasses()
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    # Phases
+
+    def beginFrame(self):
+        if not self.enabled:
+            return
+        self.frame += 1
+        self.current = {"frame": self.frame}
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        """Charge the time since the previous mark (or beginFrame) to phase."""
+        if not self.enabled or self.current is None:
+            return
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def endFrame(self):
+        if not self.enabled or self.current is None:
+            return
+        self.current["total"] = sum(value for key, value in self.current.items() if key != "frame")
+        self.samples.append(self.current)
+        self.classFrames += 1
+        self.current = None
+
+    # Per-class update timing
+
+    def instrumentClasses(self):
+        loadAll()
+        for cls in CLASSES:
+            if cls is None or cls in self.patched:
+                continue
+            self.patched[cls] = cls.__dict__.get("update")
+            cls.update = self.timedUpdate(cls.type, cls.update)
+
+    def restoreClasses(self):
+        for cls, update in self.patched.items():
+            if update is None:
+                del cls.update  # inherited again
+            else:
+                cls.update = update
+        self.patched.clear()
+
+    def timedUpdate(self, name, update):
+        stats = self.classStats.setdefault(name, [0.0, 0])
+        perf_counter = time.perf_counter
+
+        def timed(particle, *args, **kwargs):
+            start = perf_counter()
+            try:
+                return update(particle, *args, **kwargs)
+            finally:
+                stats[0] += perf_counter() - start
+                stats[1] += 1
+        return timed
+
+    # Reporting
+
+    def averages(self, frames=OVERLAY_FRAMES):
+        """Mean seconds per phase over the last frames samples."""
+        recent = list(self.samples)[-frames:]
+        totals = {}
+        for sample in recent:
+            for key, value in sample.items():
+                if key != "frame":
+                    totals[key] = totals.get(key, 0.0) + value
+        return {key: value / len(recent) for key, value in totals.items()} if recent else {}
+
+    def topClasses(self, count=5):
+        ranked = sorted(self.classStats.items(), key=lambda item: item[1][0], reverse=True)
+        return [(name, seconds, calls) for name, (seconds, calls) in ranked[:count] if calls]
+
+    def reset(self):
+        self.samples.clear()
+        self.classFrames = 0
+        for stats in self.classStats.values():
+            stats[0], stats[1] = 0.0, 0
+
+    def dump(self, path):
+        """Write the rolling window of frame samples and the per-class totals as JSON."""
+        report = {
+            "frames": list(self.samples),
+            "classFrames": self.classFrames,
+            "classes": {name: {"seconds": seconds, "calls": calls}
+                        for name, (seconds, calls) in self.classStats.items() if calls},
+        }
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
+
+    def drawOverlay(self, screen):
+        """Draw the averaged phase times and the busiest classes in the top left corner, returns the rect drawn."""
+        import pygame
+        if self.font is None:
+            self.font = pygame.font.SysFont(None, 18)
+        lines = []
+        averages = self.averages()
+        if averages:
+            lines.append(f"frame {1000 * averages.pop('total'):.2f} ms")
+            lines.extend(f"{phase} {1000 * seconds:.2f} ms" for phase, seconds in averages.items())
+        frames = max(self.classFrames, 1)
+        for name, seconds, calls in self.topClasses():
+            lines.append(f"{name} {1000 * seconds / frames:.2f} ms/f {calls / frames:.0f} calls/f")
+        surfaces = [self.font.render(line, True, (255, 255, 255)) for line in lines or ["profiling..."]]
+        width = max(surface.get_width() for surface in surfaces) + 8
+        height = sum(surface.get_height() for surface in surfaces) + 8
+        rect = pygame.Rect(0, 0, width, height)
+        screen.fill((0, 0, 0), rect)
+        y = 4
+        for surface in surfaces:
+            screen.blit(surface, (4, y))
+            y += surface.get_height()
+        return rect
+
+
+PROFILER = FrameProfiler()
@@ -0,0 +1,278 @@
+"""
+Grid rendering through a per-cell color buffer. Cell colors are written into a
+GRID_WIDTH x GRID_HEIGHT NumPy array, blitted onto a one-pixel-per-cell surface,
+scaled up by the cell size once and blitted to the screen, instead of issuing a
+pygame.draw.rect per occupied cell. Only the tiles whose colors changed since
+the last frame are pushed to the display, unless most of the window changed.
+
+The buffer covers a view of the world, width x height cells from origin, so a
+world much larger than the window only costs what is on screen (see camera.py).
+By default the view is the whole world.
+"""
+import numpy as np
+import pygame
+from materials import MATERIALS, STATIC
+from particleShaders import SHADERS
+from baseParticle import MAX_SHADER_VARIANTS
+
+EMPTY_COLOR = (0, 0, 0)
+DIRTY_TILE = 8  # cells per side of the squares that are redrawn together
+FULL_REDRAW_FRACTION = 0.4  # above this share of dirty tiles a full flip is cheaper
+BUCKET = 32  # cells per side of the squares dynamic particles are grouped in, so fills skip what is off view
+
+
+def paletteColors():
+    """
+    [materialId, variant] -> RGB of every compiled shader at the current animation
+    frame, so a whole grid of palette indices resolves with one lookup.
+    """
+    colors = np.zeros((len(MATERIALS), MAX_SHADER_VARIANTS, 3), dtype=np.uint8)
+    hasPalette = np.zeros(len(MATERIALS), dtype=bool)
+    for materialId, shaders in SHADERS.items():
+        colors[materialId, :len(shaders)] = [shader.fetchColor() for shader in shaders]
+        hasPalette[materialId] = True
+    return colors, hasPalette
+
+
+class GridRenderer:
+    def __init__(self, screen, width, height, cellSize, emptyColor=EMPTY_COLOR):
+        self.screen = screen
+        self.emptyColor = emptyColor
+        self.origin = (0, 0)  # world cell drawn in the top left corner
+        self.resizeView(width, height, cellSize)
+        # Static layer, kept up to date by observing an activity.TrackedGrid, see attach
+        self.grid = None
+        self.offset = 0
+        self.dynamic = {}
+        self.static = None
+
+    def resizeView(self, width, height, cellSize):
+        """Draw width x height cells of cellSize pixels from now on, after a window resize or a zoom."""
+        self.width = width
+        self.height = height
+        self.cellSize = cellSize
+        self.colors = np.zeros((height, width, 3), dtype=np.uint8)  # [y, x] like the grid
+        self.previous = np.zeros_like(self.colors)  # colors on the display after the last present
+        self.surface = pygame.Surface((width, height))
+        self.scaled = pygame.Surface((width * cellSize, height * cellSize))
+        self.tilesX = (width + DIRTY_TILE - 1) // DIRTY_TILE
+        self.tilesY = (height + DIRTY_TILE - 1) // DIRTY_TILE
+        self.fullRedraw = True  # the display does not match previous yet
+        self.damaged = np.zeros((self.tilesY, self.tilesX), dtype=bool)  # tiles drawn over by something else
+        self.lastDirtyRects = 0  # rects pushed by the last present, for profiling
+
+    def moveView(self, x, y):
+        """Show the world from cell (x, y) in the top left corner."""
+        if (x, y) != self.origin:
+            self.origin = (x, y)
+            self.fullRedraw = True
+
+    def viewSlices(self, worldWidth, worldHeight):
+        """
+        ((rows, columns) of a world-sized buffer, (rows, columns) of the view) for the cells
+        both cover, None when the view is off the world. The rest of the view stays empty.
+        """
+        x0, y0 = self.origin
+        x1, y1 = min(x0 + self.width, worldWidth), min(y0 + self.height, worldHeight)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return (slice(y0, y1), slice(x0, x1)), (slice(0, y1 - y0), slice(0, x1 - x0))
+
+    def invalidate(self):
+        """Redraw the whole window on the next present, after something else drew over it."""
+        self.fullRedraw = True
+
+    def damage(self, rect):
+        """Redraw the tiles under a screen rect on the next present, after an overlay was drawn there."""
+        span = DIRTY_TILE * self.cellSize
+        left, top = max(rect[0] // span, 0), max(rect[1] // span, 0)
+        right, bottom = (rect[0] + rect[2] - 1) // span, (rect[1] + rect[3] - 1) // span
+        self.damaged[top:bottom + 1, left:right + 1] = True
+
+    def attach(self, grid, offset=0):
+        """
+        Pre-render the Rock, Wood and Wall cells of a TrackedGrid and follow its writes so
+        the layer is only touched when a static cell is placed, destroyed or converted.
+        The other occupied cells are remembered by position and drawn on top each frame.
+        """
+        if self.grid is not None and self in self.grid.observers:
+            self.grid.observers.remove(self)
+        self.grid, self.offset = grid, offset
+        self.static = np.zeros((len(grid) - 2 * offset, len(grid[0]) - 2 * offset, 3), dtype=np.uint8)
+        self.static[:] = self.emptyColor  # world-sized, whatever the view
+        self.dynamic = {}  # bucket -> {(x, y) inside the border -> particle drawn over the static layer}
+        for y, row in enumerate(grid):
+            for x, particle in enumerate(row):
+                if particle is not None:
+                    self.cellChanged(x, y, None, particle)
+        grid.observers.append(self)
+        self.fullRedraw = True
+
+    def cellChanged(self, x, y, old, new):
+        x, y = x - self.offset, y - self.offset
+        height, width = self.static.shape[:2]
+        if not (0 <= x < width and 0 <= y < height):
+            return  # wall border
+        bucket = self.dynamic.get((x // BUCKET, y // BUCKET))
+        if new is not None and STATIC[new.materialId]:
+            self.static[y, x] = new.color
+            if bucket:
+                bucket.pop((x, y), None)
+            return
+        if old is not None and STATIC[old.materialId]:
+            self.static[y, x] = self.emptyColor
+        if new is None:
+            if bucket:
+                bucket.pop((x, y), None)
+        elif bucket is None:
+            self.dynamic[(x // BUCKET, y // BUCKET)] = {(x, y): new}
+        else:
+            bucket[(x, y)] = new
+
+    def fillLayered(self):
+        """Static layer with the dynamic particles on top, resolved through the shader palettes."""
+        self.colors[:] = self.emptyColor
+        slices = self.viewSlices(self.static.shape[1], self.static.shape[0])
+        if slices is None:
+            return
+        (worldRows, worldColumns), view = slices
+        self.colors[view] = self.static[worldRows, worldColumns]
+        x0, y0 = self.origin
+        x1, y1 = worldColumns.stop, worldRows.stop
+        xs, ys, materials, variants = [], [], [], []
+        fixed = []  # particles without a shader, drawn with their own color
+        for by in range(y0 // BUCKET, (y1 - 1) // BUCKET + 1):
+            for bx in range(x0 // BUCKET, (x1 - 1) // BUCKET + 1):
+                for (x, y), particle in self.dynamic.get((bx, by), {}).items():
+                    if not (x0 <= x < x1 and y0 <= y < y1):
+                        continue
+                    x, y = x - x0, y - y0
+                    if particle.shader is None:
+                        fixed.append((x, y, particle.color))
+                        continue
+                    xs.append(x)
+                    ys.append(y)
+                    materials.append(particle.materialId)
+                    variants.append(particle.shaderVariant)
+        if xs:
+            palette, _ = paletteColors()
+            self.colors[ys, xs] = palette[materials, variants]
+        for x, y, color in fixed:
+            self.colors[y, x] = color
+
+    def fillFromParticles(self, grid, offset=0):
+        """Copy particle colors from an object grid, offset being its wall padding."""
+        self.colors[:] = self.emptyColor
+        slices = self.viewSlices(len(grid[0]) - 2 * offset, len(grid) - 2 * offset)
+        if slices is None:
+            return
+        (worldRows, worldColumns), view = slices
+        empty = self.emptyColor
+        rows = grid[offset + worldRows.start:offset + worldRows.stop]
+        left, right = offset + worldColumns.start, offset + worldColumns.stop
+        colors = [particle.color if particle is not None else empty
+                  for row in rows for particle in row[left:right]]
+        self.colors[view] = np.array(colors, dtype=np.uint8).reshape(len(rows), right - left, 3)
+
+    def fillFromArrays(self, world):
+        """Copy the color array of an ArrayGrid, skipping its wall padding."""
+        self.colors[:] = self.emptyColor
+        pad = world.padding
+        slices = self.viewSlices(world.width - 2 * pad, world.height - 2 * pad)
+        if slices is None:
+            return
+        (worldRows, worldColumns), view = slices
+        rows = slice(pad + worldRows.start, pad + worldRows.stop)
+        columns = slice(pad + worldColumns.start, pad + worldColumns.stop)
+        material = world.material[rows, columns]
+        variant = world.variant[rows, columns]
+        palette, hasPalette = paletteColors()
+        colors = world.color[rows, columns].copy()
+        shaded = hasPalette[material]
+        colors[shaded] = palette[material[shaded], variant[shaded]]
+        colors[material == 0] = self.emptyColor
+        self.colors[view] = colors
+
+    def fillFromColors(self, colors, offset=0):
+        """Copy a ready [y, x] RGB buffer, like the halo workers' colors, offset being its wall padding."""
+        self.colors[:] = self.emptyColor
+        height, width = colors.shape[0] - 2 * offset, colors.shape[1] - 2 * offset
+        slices = self.viewSlices(width, height)
+        if slices is None:
+            return
+        (worldRows, worldColumns), view = slices
+        self.colors[view] = colors[offset + worldRows.start:offset + worldRows.stop,
+                                   offset + worldColumns.start:offset + worldColumns.stop]
+
+    def present(self):
+        pygame.surfarray.blit_array(self.surface, self.colors.transpose(1, 0, 2))
+        if self.fullRedraw:
+            self.presentAll()
+            return
+        dirty = self.dirtyTiles()
+        count = int(dirty.sum())
+        if count > FULL_REDRAW_FRACTION * dirty.size:
+            self.presentAll()
+        elif count:
+            self.presentTiles(dirty)
+        else:
+            self.lastDirtyRects = 0
+        self.previous[:] = self.colors
+
+    def presentAll(self):
+        pygame.transform.scale(self.surface, self.scaled.get_size(), self.scaled)
+        self.screen.blit(self.scaled, (0, 0))
+        pygame.display.flip()
+        self.previous[:] = self.colors
+        self.damaged[:] = False
+        self.fullRedraw = False
+        self.lastDirtyRects = 1
+
+    def dirtyTiles(self):
+        """Boolean [tileY, tileX] mask of the DIRTY_TILE squares holding a changed cell."""
+        changed = (self.colors != self.previous).any(axis=2)
+        tile = DIRTY_TILE
+        padded = np.zeros((self.tilesY * tile, self.tilesX * tile), dtype=bool)
+        padded[:self.height, :self.width] = changed
+        dirty = padded.reshape(self.tilesY, tile, self.tilesX, tile).any(axis=(1, 3)) | self.damaged
+        self.damaged[:] = False
+        return dirty
+
+    def presentTiles(self, dirty):
+        """Redraw runs of dirty tiles row by row and push only those rectangles."""
+        tile, size = DIRTY_TILE, self.cellSize
+        rects = []
+        for ty in range(self.tilesY):
+            row = dirty[ty]
+            tx = 0
+            while tx < self.tilesX:
+                if not row[tx]:
+                    tx += 1
+                    continue
+                start = tx
+                while tx < self.tilesX and row[tx]:
+                    tx += 1
+                x, y = start * tile, ty * tile
+                w, h = min(tx * tile, self.width) - x, min(y + tile, self.height) - y
+                area = self.surface.subsurface((x, y, w, h))
+                screenRect = pygame.Rect(x * size, y * size, w * size, h * size)
+                self.screen.blit(pygame.transform.scale(area, screenRect.size), screenRect)
+                rects.append(screenRect)
+        pygame.display.update(rects)
+        self.lastDirtyRects = len(rects)
+
+    def interpolate(self, previous, alpha):
+        """Blend the filled colors with an earlier buffer, alpha 0 giving previous and 1 the current colors."""
+        if alpha < 1.0:
+            blended = previous + (self.colors.astype(np.float32) - previous) * alpha
+            self.colors[:] = blended.astype(np.uint8)
+
+    def fill(self, grid, offset=0):
+        if grid is self.grid:
+            self.fillLayered()
+        else:
+            self.fillFromParticles(grid, offset)
+
+    def draw(self, grid, offset=0):
+        self.fill(grid, offset)
+        self.present()
@@ -4,6 +4,7 @@ from fire import Fire
 from travel import Travelling
 from gases import Smoke
 from stationary import Plant
+from materials import SLIME
 import random
 import math
 
@@ -33,36 +34,40 @@ class BaseSand(Particle):
 
 
 class Gunpowder(BaseSand):
+    type = "Gunpowder"
+
     def __init__(self, x, y):
         super().__init__(x, y, True)  
-        self.type = "Gunpowder"
         self.isExplosive = True
         self.setUpShader("Gunpowder", [(201, 190, 167), (145, 120, 112)], Still)
     
 
 class Sand(BaseSand):
+    type = "Sand"
+
     def __init__(self, x, y):
         super().__init__(x, y)  
-        self.type = "Sand"
         self.setUpShader("Sand", [(255, 232, 168), (255, 209, 82)], Still)
 
 class Gravel(BaseSand):
+    type = "Gravel"
+
     def __init__(self, x, y):
         super().__init__(x, y)
-        self.type = "Gravel"
         self.setUpShader("Gravel", [(110, 110, 110), (153, 153, 153)], Still)
 
 class Mulch(BaseSand):
+    type = "Mulch"
+
     def __init__(self, x, y):
         super().__init__(x, y, True)
         self.burnChance = 100
-        self.type = "Mulch"
         self.setUpShader("Mulch", [(69, 40, 21), (156, 71, 16)], Still)
 
     def update(self, grid):
         directions = [(0, 1), (0, -1), (-1, 0), (1, 0)]
         for dx, dy in directions:
-            if self.move(dx, dy, grid, "Slime"):
+            if self.move(dx, dy, grid, SLIME):
                 particle = Plant(self.x, self.y)
                 grid[self.y + dy][self.x + dx].delete_and_replace(grid, particle)
                 return
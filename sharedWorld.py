@@ -0,0 +1,134 @@
+"""
+Shared-memory multiprocess backend. The ArrayGrid lives in one
+multiprocessing.shared_memory block that every worker maps, so nothing but a
+byte per worker and phase crosses the pipes each frame.
+
+The grid is cut into 2 * workers column bands, worker k owning bands 2k and
+2k + 1. A frame runs every even band at once, then every odd band, so bands
+stepped together are never adjacent. Each band is stepped by the array kernels
+together with a one column halo on either side: cells may move into the halo,
+but halo cells do not act, their own band steps them in the other phase.
+"""
+import os
+import numpy as np
+from multiprocessing import Pipe, Process
+from multiprocessing.shared_memory import SharedMemory
+from arrayGrid import ArrayGrid, FIELDS
+from arrayKernels import stepRegion
+
+HALO = 1
+ALIGNMENT = 16  # byte alignment of each array inside the block
+STOP = b"S"
+DONE = b"D"
+
+
+def _aligned(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def blockSize(width, height):
+    """Bytes needed for every field of a width x height grid (border included) plus its moved mask."""
+    cells = width * height
+    sizes = [cells * int(np.prod(extra, dtype=int)) * np.dtype(dtype).itemsize for _, extra, dtype in FIELDS]
+    return sum(_aligned(size) for size in sizes) + _aligned(cells)
+
+
+class SharedArrayGrid(ArrayGrid):
+    """ArrayGrid whose fields, and a shared moved mask, are views into one SharedMemory block."""
+
+    def __init__(self, width, height, padding=0, name=None):
+        size = blockSize(width + 2 * padding, height + 2 * padding)
+        # New blocks are zero filled, so allocate() can hand out views as they are
+        self.block = SharedMemory(name=name, create=name is None, size=size if name is None else 0)
+        self.owner = name is None
+        self.offset = 0
+        super().__init__(width, height, padding)
+        self.moved = self.allocate((self.height, self.width), bool)  # cells that moved this frame, any band
+
+    def allocate(self, shape, dtype):
+        field = np.ndarray(shape, dtype=dtype, buffer=self.block.buf, offset=self.offset)
+        self.offset += _aligned(field.nbytes)
+        return field
+
+    def spec(self):
+        """Picklable arguments for attach() in another process."""
+        return (self.block.name, self.width - 2 * self.padding, self.height - 2 * self.padding, self.padding)
+
+    @classmethod
+    def attach(cls, spec):
+        name, width, height, padding = spec
+        return cls(width, height, padding, name)
+
+    def close(self):
+        """Drop the views and unmap the block, the creating process also frees it."""
+        if self.block is None:
+            return
+        for name, _, _ in FIELDS:
+            setattr(self, name, None)
+        self.moved = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
+        self.block = None
+
+
+def splitBands(width, count):
+    """count contiguous (x0, x1) column ranges covering width, as even in size as possible."""
+    if width < 2 * count:
+        raise ValueError(f"a {width} column grid is too narrow for {count} bands of at least 2 columns")
+    edges = [round(i * width / count) for i in range(count + 1)]
+    return [(edges[i], edges[i + 1]) for i in range(count)]
+
+
+def stepBand(world, x0, x1, rng):
+    """Step columns x0 to x1 - 1 of a SharedArrayGrid in place, with a halo column on either side."""
+    stepRegion(world, world.moved, x0, 0, x1, world.height, rng, HALO)
+
+
+def bandWorker(spec, bands, seed, conn):
+    world = SharedArrayGrid.attach(spec)
+    rng = np.random.default_rng(seed)
+    try:
+        while True:
+            message = conn.recv_bytes()
+            if message == STOP:
+                break
+            x0, x1 = bands[message[0]]  # the message is the phase, 0 for even bands and 1 for odd
+            stepBand(world, x0, x1, rng)
+            conn.send_bytes(DONE)
+    finally:
+        world.close()
+
+
+class SharedStepper:
+    """Steps a SharedArrayGrid with persistent workers, signalling them over pipes."""
+
+    def __init__(self, world, workers=None, seed=0):
+        workers = workers or os.cpu_count() or 1
+        workers = max(1, min(workers, world.width // 4))  # every band needs at least 2 columns
+        self.world = world
+        self.bands = splitBands(world.width, 2 * workers)
+        self.connections = []
+        self.processes = []
+        for k in range(workers):
+            parent, child = Pipe()
+            process = Process(target=bandWorker, daemon=True,
+                              args=(world.spec(), self.bands[2 * k:2 * k + 2], seed + k, child))
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def step(self):
+        self.world.moved[:] = False
+        for phase in (b"\x00", b"\x01"):
+            for conn in self.connections:
+                conn.send_bytes(phase)
+            for conn in self.connections:
+                conn.recv_bytes()
+
+    def close(self):
+        for conn in self.connections:
+            conn.send_bytes(STOP)
+        for process in self.processes:
+            process.join()
+        self.connections, self.processes = [], []
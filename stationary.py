@@ -1,20 +1,25 @@
 from baseParticle import Particle, SHADER_CACHE_SPECIFICS
 from particleShaders import Still, Randomize, Shimmer
 import random
+from materials import WATER, MULCH
+
+PLANT_GROWS_INTO = [WATER, MULCH]
 
 class Rock(Particle):
+    type = "Rock"
+
     def __init__(self, x, y):
         super().__init__(x, y)  # Water color
-        self.type = "Rock"
         self.setUpShader("Rock", [(71, 71, 71), (80, 80, 80)], Still)
     
     def update(self, grid):
         return
     
 class Wood(Particle): 
+    type = "Wood"
+
     def __init__(self, x, y):
         super().__init__(x, y, True) 
-        self.type = "Wood"
         self.burnChance = 25
         self.setUpShader("Wood", [(41, 26, 23), (79, 67, 47)], Still)
     
@@ -22,19 +27,25 @@ class Wood(Particle):
         return
     
 class Plant(Particle):
+    type = "Plant"
+
     def __init__(self, x, y):
         super().__init__(x, y, True) 
-        self.type = "Plant"
         self.burnChance = 25
         self.setUpShader("Plant", [(76, 212, 15), (46, 125, 9)], Still)
 
     def update(self, grid):
         directions = [(0, 1), (0, -1), (-1, 0), (1, 0)]
-        mats =  ["Water", "Mulch"]
-        for mat in mats:
+        for mat in PLANT_GROWS_INTO:
             for dx, dy in directions:
                 if self.move(dx, dy, grid, mat):
                     particle = Plant(self.x + dx, self.y + dy)
                     grid[self.y + dy][self.x + dx].delete_and_replace(grid, particle)
             return
         super().update(grid)
+
+class Wall(Particle):
+    type = "Wall"  # Border of a padded grid, see padding.py
+
+    def update(self, grid):
+        return
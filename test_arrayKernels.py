@@ -0,0 +1,170 @@
+"""
+Invariants of the NumPy kernels on small seeded grids: nothing is created or lost,
+no cell moves further than one object update could take it, and materials layer by density.
+Run with python -m pytest.
+"""
+import numpy as np
+import pytest
+from arrayGrid import ArrayGrid
+from arrayKernels import fallStraight, slideDiagonal, disperse, sinkDenser, stepWorld, ageGases, SAND_LOOKUP, \
+    FLUID_LOOKUP
+from materials import EMPTY, SAND, WATER, OIL, STEAM, SMOKE, ROCK, IS_GAS, SPREAD, loadAll
+
+loadAll()
+
+# Map characters of a picture to materials, rows top to bottom
+PICTURE = {".": EMPTY, "s": SAND, "w": WATER, "o": OIL, "g": STEAM, "k": SMOKE, "#": ROCK}
+IS_GAS_ARRAY = np.array(IS_GAS, dtype=bool)
+
+
+def fromPicture(*rows):
+    world = ArrayGrid(len(rows[0]), len(rows))
+    world.material[:] = [[PICTURE[c] for c in row] for row in rows]
+    world.lifetime[IS_GAS_ARRAY[world.material]] = 1000  # gases outlive every test
+    return world
+
+
+def toPicture(world):
+    names = {materialId: c for c, materialId in PICTURE.items()}
+    return ["".join(names[m] for m in row) for row in world.material.tolist()]
+
+
+def randomWorld(seed, width=24, height=24, materials=(SAND, WATER, OIL, ROCK)):
+    rng = np.random.default_rng(seed)
+    world = ArrayGrid(width, height)
+    picks = rng.integers(len(materials) + 1, size=(height, width))
+    for index, materialId in enumerate(materials, 1):
+        world.material[picks == index] = materialId
+    return world
+
+
+def tagCells(world):
+    """Give every occupied cell a unique id in its lifetime field, which moves with the cell."""
+    ys, xs = np.nonzero(world.material)
+    world.lifetime[ys, xs] = np.arange(1, len(ys) + 1)
+    return {int(world.lifetime[y, x]): (int(y), int(x), int(world.material[y, x])) for y, x in zip(ys, xs)}
+
+
+def histogram(world):
+    return np.bincount(world.material.ravel(), minlength=len(IS_GAS))
+
+
+def test_fall_straight_shifts_whole_stacks():
+    world = fromPicture(
+        "s.s.",
+        "s...",
+        "..s.",
+        "...#",
+    )
+    fallStraight(world, SAND_LOOKUP[world.material], np.zeros((4, 4), dtype=bool))
+    assert toPicture(world) == [
+        "....",
+        "s.s.",
+        "s...",
+        "..s#",
+    ]
+
+
+def test_slide_diagonal_only_moves_supported_grains():
+    world = fromPicture(
+        ".....",
+        "..s..",
+        "..s..",
+        "#####",
+    )
+    moved = np.zeros((4, 5), dtype=bool)
+    slideDiagonal(world, SAND_LOOKUP, moved, np.random.default_rng(0))
+    picture = toPicture(world)
+    assert picture[1] == "....."  # the top grain slid off the one below
+    assert picture[2] in ("..ss.", ".ss..")  # next to the one below, which stayed where it was
+    assert moved.sum() == 1
+
+
+def test_disperse_stays_within_spread():
+    world = fromPicture(
+        "...........",
+        ".....w.....",
+        "###########",
+    )
+    disperse(world, FLUID_LOOKUP, np.zeros((3, 11), dtype=bool), np.random.default_rng(0))
+    x = toPicture(world)[1].index("w")
+    assert abs(x - 5) == SPREAD[WATER]
+
+
+def test_sink_denser_swaps_each_cell_once():
+    world = fromPicture(
+        "s",
+        "s",
+        "w",
+        "w",
+    )
+    moved = np.zeros((4, 1), dtype=bool)
+    sinkDenser(world, moved)
+    assert toPicture(world) == ["s", "w", "s", "w"]  # two disjoint pairs would sink the sand in one step
+    assert moved[1:3].all() and not moved[0] and not moved[3]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_step_conserves_mass(seed):
+    world = randomWorld(seed)
+    before = histogram(world)
+    rng = np.random.default_rng(seed)
+    for _ in range(10):
+        stepWorld(world, rng)
+        assert (histogram(world) == before).all()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_step_moves_cells_at_most_once(seed):
+    world = randomWorld(seed)
+    tags = tagCells(world)
+    stepWorld(world, np.random.default_rng(seed))
+    ys, xs = np.nonzero(world.material)
+    seen = set()
+    for y, x in zip(ys.tolist(), xs.tolist()):
+        tag = int(world.lifetime[y, x])
+        assert tag not in seen
+        seen.add(tag)
+        startY, startX, materialId = tags[tag]
+        assert world.material[y, x] == materialId
+        if materialId == ROCK:
+            assert (y, x) == (startY, startX)
+        elif materialId == SAND:
+            assert 0 <= y - startY <= 1 and abs(x - startX) <= 1
+        else:
+            # A fluid falls, slides or spreads, or is swapped up one cell by a denser cell sinking into it
+            assert -1 <= y - startY <= 1 and abs(x - startX) <= SPREAD[materialId] + 1
+    assert seen == set(tags)
+
+
+def test_layers_settle_by_density():
+    # Oil under water under sand, every column has to turn over
+    world = fromPicture(*(["ssss"] * 3 + ["wwww"] * 3 + ["oooo"] * 3 + ["####"]))
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        stepWorld(world, rng)
+    assert toPicture(world) == ["oooo"] * 3 + ["wwww"] * 3 + ["ssss"] * 3 + ["####"]
+
+
+def test_gases_rise_and_age():
+    world = fromPicture(
+        ".....",
+        ".....",
+        "..k..",
+        "#####",
+    )
+    world.delay[2, 2] = 2  # ready to move
+    stepWorld(world, np.random.default_rng(0))
+    assert toPicture(world)[1] == "..k.."
+    assert world.lifetime[1, 2] == 999
+
+
+def test_handled_gases_are_not_aged_again():
+    world = fromPicture("g.", "##")
+    world.lifetime[0, 0] = 1
+    handled = np.zeros((2, 2), dtype=bool)
+    handled[0, 0] = True
+    for seed in range(10):
+        copy = world.copy()
+        alive = ageGases(copy, np.random.default_rng(seed), handled=handled)
+        assert copy.material[0, 0] == STEAM and copy.lifetime[0, 0] == 1 and not alive.any()
@@ -0,0 +1,77 @@
+"""
+Batched blasts against the cell-by-cell explode() they replaced: a single blast must
+leave the same Smoke and Fire behind. Run with python -m pytest.
+"""
+import math
+import pytest
+from explosions import queueExplosion, resolveExplosions
+from materials import CLASSES, FIRE, loadAll
+from gases import Smoke, MysteriousVapor
+
+loadAll()
+
+
+def legacyExplode(grid, x, y, radius, emission):
+    """Particle.explode before blasts were batched, without the random flinging an empty grid never reaches."""
+    Fire = CLASSES[FIRE]
+    for i in range(-radius, radius + 1):
+        for j in range(-radius, radius + 1):
+            target_x, target_y = x + i, y + j
+            if 0 <= target_x < len(grid[0]) and 0 <= target_y < len(grid):
+                distance = math.sqrt(i**2 + j**2)
+                if distance <= radius:
+                    if grid[target_y][target_x] is not None:
+                        grid[target_y][target_x] = None  # gases and fire are never flung
+                    if radius - 0.5 <= distance <= radius + 0.5:
+                        if grid[target_y][target_x] is None:
+                            grid[target_y][target_x] = Fire(target_x, target_y)
+                    if distance > 1:
+                        new_x = target_x + int(i / distance * 2)
+                        new_y = target_y + int(j / distance * 2)
+                        if 0 <= new_x < len(grid[0]) and 0 <= new_y < len(grid):
+                            if grid[new_y][new_x] is None:
+                                grid[new_y][new_x] = emission(new_x, new_y)
+
+
+def census(grid):
+    totals = {}
+    for row in grid:
+        for particle in row:
+            if particle is not None:
+                totals[particle.type] = totals.get(particle.type, 0) + 1
+    return totals
+
+
+def layout(grid):
+    return [[None if particle is None else particle.type for particle in row] for row in grid]
+
+
+@pytest.mark.parametrize("radius, emission, x, y", [
+    (8, Smoke, 30, 30),
+    (20, MysteriousVapor, 30, 30),
+    (8, Smoke, 3, 57),  # clipped by the grid corner
+])
+def test_single_blast_matches_cell_by_cell_explode(radius, emission, x, y):
+    expected = [[None] * 60 for _ in range(60)]
+    legacyExplode(expected, x, y, radius, emission)
+    grid = [[None] * 60 for _ in range(60)]
+    queueExplosion(grid, x, y, radius, emission)
+    resolveExplosions()
+    assert census(grid) == census(expected)
+    assert layout(grid) == layout(expected)
+
+
+def test_radius_8_blast_counts():
+    grid = [[None] * 60 for _ in range(60)]
+    queueExplosion(grid, 30, 30, 8, Smoke)
+    resolveExplosions()
+    assert census(grid) == {"Smoke": 112, "Fire": 20}
+
+
+def test_blast_through_gas_matches_cell_by_cell_explode():
+    expected = [[Smoke(x, y) for x in range(40)] for y in range(40)]
+    legacyExplode(expected, 20, 20, 6, Smoke)
+    grid = [[Smoke(x, y) for x in range(40)] for y in range(40)]
+    queueExplosion(grid, 20, 20, 6, Smoke)
+    resolveExplosions()
+    assert layout(grid) == layout(expected)
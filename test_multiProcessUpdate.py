@@ -0,0 +1,113 @@
+"""
+Checks of the tile layout the tiles backend relies on: tiles of one phase never share
+a cell of their windows, and reassembled changes wake the tiles around them.
+Run with python -m pytest.
+"""
+import itertools
+import pytest
+import padding
+from activity import ChunkTracker, SLEEP_DELAY
+from multiProcessUpdate import TileLayout, ChunkLayout, update_tile
+from haloExchange import HaloStepper
+from sand import Sand
+from fluids import Water
+
+# Sizes that leave narrower tiles on the right and bottom edges
+UNEVEN = [(53, 47, 10, 12), (41, 41, 20, None), (30, 95, 11, 10), (10, 10, 10, None)]
+
+
+def windowCells(window):
+    xlo, ylo, xhi, yhi = window
+    return {(x, y) for y in range(ylo, yhi) for x in range(xlo, xhi)}
+
+
+def asleep(tracker):
+    for _ in range(SLEEP_DELAY + 2):
+        tracker.beginFrame()
+    assert tracker.awakeCount() == 0
+
+
+@pytest.mark.parametrize("width, height, tileWidth, tileHeight", UNEVEN)
+def test_tiles_cover_the_grid_once(width, height, tileWidth, tileHeight):
+    layout = TileLayout(width, height, tileWidth, tileHeight)
+    cells = [windowCells(tile) for tile in layout.tiles]
+    assert sum(len(owned) for owned in cells) == width * height
+    assert set().union(*cells) == windowCells((0, 0, width, height))
+    assert sorted(itertools.chain(*layout.phases)) == list(range(len(layout.tiles)))
+
+
+@pytest.mark.parametrize("width, height, tileWidth, tileHeight", UNEVEN)
+def test_windows_within_a_phase_are_disjoint(width, height, tileWidth, tileHeight):
+    layout = TileLayout(width, height, tileWidth, tileHeight)
+    for phase in layout.phases:
+        for a, b in itertools.combinations(phase, 2):
+            assert not windowCells(layout.window(a)) & windowCells(layout.window(b)), (a, b)
+
+
+def test_chunk_windows_within_a_phase_are_disjoint():
+    layout = ChunkLayout(107, 13)
+    for phase in layout.phases:
+        for a, b in itertools.combinations(phase, 2):
+            (alo, ahi), (blo, bhi) = layout.window(a), layout.window(b)
+            assert ahi <= blo or bhi <= alo
+
+
+def test_tiles_too_small_for_the_halo_are_refused():
+    with pytest.raises(ValueError):
+        TileLayout(40, 40, 8)
+
+
+def test_reassembled_change_wakes_the_neighbouring_tile():
+    grid = padding.padGrid([[None] * 40 for _ in range(40)])
+    layout = TileLayout(len(grid[0]), len(grid), 10)
+    tracker = ChunkTracker(len(grid[0]), len(grid))
+    asleep(tracker)
+    index = 0
+    x0, y0, x1, y1 = layout.tiles[index]
+    section = layout.task(grid, index, 1)[0]
+    xlo, ylo, _, _ = layout.window(index)
+    # A grain lands on the tile's right edge, the first column of tile 1 can react to it next frame
+    section[y1 - 1 - ylo][x1 - 1 - xlo] = Sand(x1 - 1, y1 - 1)
+    layout.reassemble(grid, [section], [index], tracker)
+    tracker.beginFrame()
+    assert layout.isAwake(index, tracker)
+    assert layout.isAwake(1, tracker)
+    far = max(range(len(layout.tiles)), key=lambda i: layout.tiles[i][0] + layout.tiles[i][1])
+    assert not layout.isAwake(far, tracker)
+
+
+def test_falling_water_is_never_left_in_a_sleeping_tile():
+    grid = padding.padGrid([[None] * 40 for _ in range(40)])
+    layout = TileLayout(len(grid[0]), len(grid), 10)
+    tracker = ChunkTracker(len(grid[0]), len(grid))
+    water = grid[12][12] = Water(12, 12)
+    asleep(tracker)
+    tracker.cellChanged(12, 12, None, water)
+    floor = len(grid) - padding.PADDING - 1
+    for frame in range(1, 60):
+        tracker.beginFrame()
+        for phase in layout.phases:
+            indices = [i for i in phase if layout.isAwake(i, tracker)]
+            sections = [update_tile(layout.task(grid, i, frame)) for i in indices]
+            layout.reassemble(grid, sections, indices, tracker)
+    assert any(cell is not None and cell.type == "Water" for cell in grid[floor])
+
+
+def test_halo_workers_share_out_the_chunk_pairs():
+    grid = padding.padGrid([[None] * 100 for _ in range(30)])
+    layout = ChunkLayout(len(grid[0]), 10, workers=3)
+    for x in range(padding.PADDING, 100 + padding.PADDING, 3):
+        grid[8][x] = Sand(x, 8)
+    stepper = HaloStepper(grid, layout)
+    try:
+        assert len(stepper.processes) == 3
+        assert [start for start, _ in stepper.regions[1:]] == [end for _, end in stepper.regions[:-1]]
+        assert stepper.regions[0][0] == 0 and stepper.regions[-1][1] == len(grid[0])
+        for frame in range(1, 30):
+            stepper.step(frame)
+        floor = len(grid) - padding.PADDING - 1
+        gathered = stepper.gather()
+        assert sum(cell is not None and cell.type == "Sand" for row in gathered for cell in row) == 34
+        assert sum(cell is not None and cell.type == "Sand" for cell in gathered[floor]) == 34
+    finally:
+        stepper.close()
@@ -0,0 +1,36 @@
+"""
+A flung particle follows the same arc whatever the simulation rate. Run with python -m pytest.
+"""
+import pickle
+import pytest
+import padding
+from baseParticle import Particle
+from materials import CLASSES, SAND, loadAll
+from travel import Travelling
+
+loadAll()
+
+
+def fling(stepsPerSecond, seconds=1):
+    grid = [[None] * 200 for _ in range(200)]
+    particle = grid[150][10] = Travelling(10, 150, 1, -1, 2, CLASSES[SAND](10, 150))
+    for _ in range(int(stepsPerSecond * seconds)):
+        particle.update(grid, 1 / stepsPerSecond)
+    assert grid[particle.y][particle.x] is particle
+    return particle.last_safe_position
+
+
+@pytest.mark.parametrize("stepsPerSecond", [30, 120, 240])
+def test_arc_does_not_depend_on_the_step_rate(stepsPerSecond):
+    x, y = fling(stepsPerSecond)
+    expectedX, expectedY = fling(60)
+    assert x == pytest.approx(expectedX)
+    assert abs(y - expectedY) < 1  # gravity is integrated per step, the arc drifts a fraction of a cell
+
+
+def test_worker_windows_keep_the_grid_step_length():
+    grid = padding.padGrid([[None] * 20 for _ in range(20)])
+    grid.stepDt = 1 / 30
+    rows = padding.window(grid, [row[:12] for row in grid], padding.PADDING)
+    assert Particle.stepLength(pickle.loads(pickle.dumps(rows))) == 1 / 30
+    assert Particle.stepLength([[None]]) == 1 / 60
@@ -0,0 +1,52 @@
+"""
+Thread-pool backend for the array world. The ArrayGrid is cut into tiles that
+are stepped by the NumPy kernels in a concurrent.futures.ThreadPoolExecutor,
+all threads writing into the one world with no copies. NumPy releases the GIL
+inside its loops, and on a free-threaded CPython build the Python glue runs in
+parallel as well.
+
+Tiles run in the four phases of a 2x2 checkerboard (multiProcessUpdate.TileLayout)
+so tiles stepped at once are a whole tile apart, and each is stepped with a
+frozen one cell halo like the shared-memory bands (sharedWorld.py).
+"""
+import math
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from arrayKernels import stepRegion
+from multiProcessUpdate import TileLayout
+
+HALO = 1
+
+
+class ThreadedStepper:
+    """Steps an ArrayGrid in place with a pool of threads, one task per tile."""
+
+    def __init__(self, world, tileSize=None, workers=None, seed=0):
+        workers = workers or os.cpu_count() or 1
+        self.world = world
+        if tileSize is None:
+            # Two rows of 2 * workers tiles, one tile per thread in each phase: every kernel call
+            # has a fixed cost, so fewer, bigger tiles beat many small ones
+            tileWidth, tileHeight = math.ceil(world.width / (2 * workers)), math.ceil(world.height / 2)
+        else:
+            tileWidth = tileHeight = tileSize
+        tileWidth, tileHeight = max(tileWidth, 2 * HALO), max(tileHeight, 2 * HALO)
+        self.layout = TileLayout(world.width, world.height, tileWidth, tileHeight, HALO, workers)
+        self.moved = np.zeros(world.material.shape, dtype=bool)
+        # A generator per tile, Generators are not thread safe and this keeps runs reproducible
+        self.rngs = [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(len(self.layout.tiles))]
+        self.executor = ThreadPoolExecutor(max_workers=self.layout.workers, thread_name_prefix="tiles")
+
+    def stepTile(self, index):
+        x0, y0, x1, y1 = self.layout.tiles[index]
+        stepRegion(self.world, self.moved, x0, y0, x1, y1, self.rngs[index], HALO)
+
+    def step(self):
+        self.moved[:] = False
+        for phase in self.layout.phases:
+            # list() waits for the phase and re-raises any error from a tile
+            list(self.executor.map(self.stepTile, phase))
+
+    def close(self):
+        self.executor.shutdown()
@@ -0,0 +1,75 @@
+"""
+Fixed-timestep scheduling. The simulation advances in steps of a fixed length
+of simulated time, however fast frames are drawn: every frame the real time
+that passed is added to an accumulator, and one step runs for every whole step
+length it holds.
+
+    timestep = FixedTimestep(stepsPerSecond=60)
+    while running:
+        timestep.apply(grid)
+        for _ in range(timestep.advance()):
+            step()
+        draw(timestep.alpha)
+
+When a frame falls far behind, at most maxSteps run and the rest of the backlog
+is dropped, so a slow frame cannot snowball into ever longer catch-up frames.
+Uncapped, one step runs per call as fast as the loop goes, for throughput runs.
+"""
+import time
+
+STEPS_PER_SECOND = 60
+MAX_STEPS = 5  # steps one frame may run to catch up before the backlog is dropped
+
+
+class FixedTimestep:
+    def __init__(self, stepsPerSecond=STEPS_PER_SECOND, maxSteps=MAX_STEPS, uncapped=False, clock=time.perf_counter):
+        self.clock = clock
+        self.maxSteps = maxSteps
+        self.uncapped = uncapped
+        self.accumulator = 0.0
+        self.last = None
+        self.steps = 0  # steps run in total
+        self.dropped = 0.0  # seconds of backlog thrown away by the catch-up limit
+        self.setRate(stepsPerSecond)
+
+    def setRate(self, stepsPerSecond):
+        """Change the simulation rate, the grid only steps at it once passed to apply."""
+        self.stepsPerSecond = stepsPerSecond
+        self.dt = 1.0 / stepsPerSecond
+
+    def apply(self, grid):
+        """Give grid this step length, particles that integrate over time read it with Particle.stepLength(grid)."""
+        grid.stepDt = self.dt
+
+    def advance(self):
+        """Account for the real time since the last call and return how many steps to run now."""
+        now = self.clock()
+        if self.uncapped:
+            self.last = now
+            self.steps += 1
+            return 1
+        if self.last is None:
+            self.last = now  # the first frame only starts the clock
+        self.accumulator += now - self.last
+        self.last = now
+        steps = int(self.accumulator / self.dt)
+        if steps > self.maxSteps:
+            self.dropped += (steps - self.maxSteps) * self.dt
+            steps = self.maxSteps
+        self.accumulator -= steps * self.dt
+        if self.accumulator >= self.dt:
+            self.accumulator %= self.dt  # what the limit cut off is not owed later
+        self.steps += steps
+        return steps
+
+    @property
+    def alpha(self):
+        """How far the next step is along, 0 to 1, for blending the last two simulated states."""
+        if self.uncapped:
+            return 1.0
+        return min(self.accumulator / self.dt, 1.0)
+
+    def reset(self):
+        """Forget the elapsed time, after a pause or a blocking load."""
+        self.accumulator = 0.0
+        self.last = None
@@ -0,0 +1,99 @@
+"""
+Opt-in Chrome trace-event recorder for the multiprocess engine. Set the
+SANDSIM_TRACE environment variable to an output path (or call enable) before
+the workers start; every process then records begin/end events for its spans,
+workers send theirs back with each result, and write() saves one JSON file
+that opens in Perfetto or chrome://tracing.
+
+    with tracing.span("reassemble"):
+        grid = reassembleGrid(grid, chunks)
+"""
+import json
+import os
+import threading
+import time
+
+TRACE_PATH = os.environ.get("SANDSIM_TRACE")
+ENABLED = bool(TRACE_PATH)
+MAX_EVENTS = 2_000_000  # stop recording past this many events rather than grow without bound
+EVENTS = []
+_names = {}  # pid -> process name for the metadata events
+
+
+def enable(path="trace.json"):
+    """Turn tracing on in this process, and in workers started after this call (they inherit the variable)."""
+    global ENABLED, TRACE_PATH
+    ENABLED, TRACE_PATH = True, path
+    os.environ["SANDSIM_TRACE"] = path
+
+
+def _record(name, phase, args=None):
+    if len(EVENTS) >= MAX_EVENTS:
+        return
+    event = {"name": name, "ph": phase, "ts": time.perf_counter_ns() / 1000,
+             "pid": os.getpid(), "tid": threading.get_native_id()}
+    if args:
+        event["args"] = args
+    EVENTS.append(event)
+
+
+def begin(name, **args):
+    if ENABLED:
+        _record(name, "B", args)
+
+
+def end(name):
+    if ENABLED:
+        _record(name, "E")
+
+
+class span:
+    """Context manager recording a begin/end pair, a flag test when tracing is off."""
+    __slots__ = ("name", "args")
+
+    def __init__(self, name, **args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        if ENABLED:
+            _record(self.name, "B", self.args)
+        return self
+
+    def __exit__(self, *exc):
+        if ENABLED:
+            _record(self.name, "E")
+        return False
+
+
+def nameProcess(name):
+    """Label this process in the trace viewer, e.g. "main" or "worker 3"."""
+    if ENABLED:
+        _names[os.getpid()] = name
+
+
+def take():
+    """Remove and return the events recorded so far, for a worker to send back with its result."""
+    events = EVENTS[:]
+    EVENTS.clear()
+    for pid, name in _names.items():
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}})
+    return events
+
+
+def merge(events):
+    """Add events recorded by another process."""
+    for event in events:
+        if event["ph"] == "M":
+            _names[event["pid"]] = event["args"]["name"]
+        elif len(EVENTS) < MAX_EVENTS:
+            EVENTS.append(event)
+
+
+def write(path=None):
+    path = path or TRACE_PATH or "trace.json"
+    metadata = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
+                for pid, name in _names.items()]
+    with open(path, "w") as file:
+        json.dump({"traceEvents": metadata + EVENTS, "displayTimeUnit": "ms"}, file)
+    return path
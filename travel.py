@@ -2,43 +2,55 @@ from baseParticle import Particle, SHADER_CACHE_SPECIFICS
 from particleShaders import Still, Randomize, Shimmer
 import random
 import math
+from materials import CLASSES, GRAVEL, MULCH, ROCK, WOOD
+
+TUNED_RATE = 60  # steps per second the blast force was tuned at, in cells per step
 
 class Travelling(Particle):
+    type = "Travelling"
+
     def __init__(self, x, y, dx, dy, force, oldParticle, flammable=False):
         super().__init__(x, y, flammable)
-        self.type = "Travelling"
         self.oldParticle = oldParticle  
 
         # Normalize direction and scale with force
         magnitude = math.sqrt(dx**2 + dy**2) or 1  # Avoid division by zero
-        self.velocity = [(dx / magnitude) * force, (dy / magnitude) * force]
+        self.velocity = [(dx / magnitude) * force * TUNED_RATE, (dy / magnitude) * force * TUNED_RATE]  # cells per second
 
-        self.gravity = 0.2  # Reduce gravity for smoother arcs
+        self.gravity = 0.2 * TUNED_RATE  # cells per second squared, reduced for smoother arcs
         self.last_safe_position = (float(x), float(y))  # Store position with float precision
 
-    def update(self, grid, dt = 0.016):
-        from sand import Gravel, Mulch
-        """Update position based on velocity and gravity."""
+    def translate(self, dx, dy):
+        # Chunked updates shift x and y into a subgrid's frame, the float position has to follow
+        super().translate(dx, dy)
+        self.last_safe_position = (self.last_safe_position[0] + dx, self.last_safe_position[1] + dy)
+
+    def update(self, grid, dt = None):
+        """Update position based on velocity and gravity, over dt seconds (one simulation step by default)."""
+        if dt is None:
+            dt = self.stepLength(grid)
         self.velocity[1] += self.gravity * dt  # Apply gravity incrementally
 
         # Update position in **float values** for smooth movement
-        new_x = self.last_safe_position[0] + self.velocity[0]
-        new_y = self.last_safe_position[1] + self.velocity[1]
+        new_x = self.last_safe_position[0] + self.velocity[0] * dt
+        new_y = self.last_safe_position[1] + self.velocity[1] * dt
 
         # Convert to integer for grid positioning
         grid_x = int(new_x)
         grid_y = int(new_y)
 
-        if self.can_move(grid_x, grid_y, grid):
+        if (grid_x, grid_y) == (self.x, self.y):
+            self.last_safe_position = (new_x, new_y)  # still inside its cell, at high step rates
+        elif self.can_move(grid_x, grid_y, grid):
             self.last_safe_position = (new_x, new_y)  # Store continuous position
             self.move(grid_x - self.x, grid_y - self.y, grid)  # Update grid
         else:
             # Collision detected → Stop and replace with old particle
             last_x, last_y = int(self.last_safe_position[0]), int(self.last_safe_position[1])
-            if self.oldParticle.type == "Rock":
-                self.oldParticle = Gravel(last_x, last_y)
-            elif self.oldParticle.type == "Wood":
-                self.oldParticle = Mulch(last_x, last_y)
+            if self.oldParticle.materialId == ROCK:
+                self.oldParticle = CLASSES[GRAVEL](last_x, last_y)
+            elif self.oldParticle.materialId == WOOD:
+                self.oldParticle = CLASSES[MULCH](last_x, last_y)
 
             grid[self.y][self.x] = None  # Remove Travelling particle
             grid[last_y][last_x] = self.oldParticle  # Restore old particle
@@ -47,4 +59,6 @@ class Travelling(Particle):
 
     def can_move(self, x, y, grid):
         """Check if movement is possible."""
-        return 0 <= x < len(grid[0]) and 0 <= y < len(grid) and grid[y][x] is None
\ No newline at end of file
+        if self.checksBounds(grid) and not (0 <= x < len(grid[0]) and 0 <= y < len(grid)):
+            return False
+        return grid[y][x] is None
\ No newline at end of file